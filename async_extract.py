@@ -0,0 +1,273 @@
+import asyncio
+import os
+import random
+import time
+import httpx
+from bkc_config import load_config
+from llm_cache import get_llm_cache
+from metrics import metrics, record_llm_usage
+from ml_bkc import PagePacker, chunk_filename, chunk_text, iter_page_texts
+from port_resolver import get_port_resolver
+from prompt_builder import estimate_tokens, get_prompt_builder
+
+# Defaults sized for our Mistral quota; override per worker through the environment.
+MAX_CONCURRENCY = int(os.getenv("MISTRAL_MAX_CONCURRENCY", "16"))
+REQUESTS_PER_SECOND = float(os.getenv("MISTRAL_RPS", "5"))
+TOKENS_PER_MINUTE = float(os.getenv("MISTRAL_TPM", "500000"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens are added per second up to `capacity`.
+    acquire(n) waits until n tokens are available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def _is_retryable(error):
+    from mistralai.exceptions import MistralAPIException, MistralConnectionException
+    if isinstance(error, MistralAPIException):
+        return error.http_status is None or error.http_status in RETRY_STATUSES
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (MistralConnectionException, httpx.TransportError, asyncio.TimeoutError))
+
+
+async def with_retries(call, attempts=5, base_delay=0.5, max_delay=30.0):
+    """
+    Awaits call() and retries 429/5xx and connection errors with full-jitter
+    exponential backoff. Other errors are raised immediately.
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == attempts - 1 or not _is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"Retrying after {type(e).__name__} ({e}), attempt {attempt + 2}/{attempts} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+class AsyncExtractor:
+    """
+    Keeps many pages and documents in flight from a single worker.
+    LLM calls share a global semaphore plus request and token rate limits;
+    OCR runs on the process OCR pool in executor threads.
+    Args:
+        api_key (str): Mistral AI API key.
+        model (str): Mistral AI model name.
+        max_concurrency (int): Maximum Mistral calls in flight.
+        requests_per_second (float): Mistral request quota.
+        tokens_per_minute (float): Mistral token quota.
+        port_url (str): Port lookup service used by fetch_port_code(), defaults to PORT_URL in the config.
+        port_concurrency (int): Maximum port lookups in flight.
+        port_cache (PortCodeCache): Optional cache checked before port lookups.
+        config (dict): Parsed configuration for the port settings (PORT_URL, UNLOCODE_CSV,
+            PORT_MATCH_MIN_SCORE, PORT_OFFLINE, PORT_OFFLINE_MIN_SCORE), defaults to load_config().
+        ocr_pool (OCREnginePool): OCR engines, defaults to get_ocr_pool() once a page needs OCR.
+        llm_cache (LLMResponseCache): Cache of LLM answers, defaults to get_llm_cache().
+        prompt_builder (PromptBuilder): Builds each page prompt, defaults to get_prompt_builder().
+    """
+
+    def __init__(self, api_key, model, max_concurrency=MAX_CONCURRENCY,
+                 requests_per_second=REQUESTS_PER_SECOND, tokens_per_minute=TOKENS_PER_MINUTE,
+                 port_url=None, port_concurrency=10, port_cache=None, ocr_pool=None, llm_cache=None, prompt_builder=None,
+                 timeout=120, config=None):
+        from mistralai.async_client import MistralAsyncClient
+        self.model = model
+        self.client = MistralAsyncClient(api_key=api_key, timeout=timeout,
+                                         endpoint=os.getenv("MISTRAL_ENDPOINT", "https://api.mistral.ai"))
+        self.llm_slots = asyncio.Semaphore(max_concurrency)
+        self.request_bucket = TokenBucket(requests_per_second)
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute)
+        config = config if config is not None else load_config()
+        # Same port settings and defaults as PostProcess
+        self.port_url = port_url or config.get('PORT_URL', 'http://216.48.186.19:8085/find-port')
+        self.port_resolver = None
+        if config.get('UNLOCODE_CSV'):
+            self.port_resolver = get_port_resolver(config['UNLOCODE_CSV'], config.get('PORT_MATCH_MIN_SCORE', 0.85))
+        self.port_offline = config.get('PORT_OFFLINE', False)
+        self.port_offline_min_score = config.get('PORT_OFFLINE_MIN_SCORE', 0.6)
+        self.port_slots = asyncio.Semaphore(port_concurrency)
+        self.port_cache = port_cache
+        self.http = httpx.AsyncClient(timeout=httpx.Timeout(10.0, connect=3.05),
+                                      limits=httpx.Limits(max_connections=port_concurrency))
+        self.ocr_pool = ocr_pool
+        self.llm_cache = llm_cache or get_llm_cache()
+        self.prompt_builder = prompt_builder or get_prompt_builder()
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+    async def chat_page(self, page_text):
+        from mistralai.models.chat_completion import ChatMessage
+        loop = asyncio.get_running_loop()
+        if self.llm_cache is not None:
+            cached = await loop.run_in_executor(None, self.llm_cache.get, page_text,
+                                                self.prompt_builder.cache_key, self.model)
+            if cached is not None:
+                record_llm_usage(cached[1], cached=True)
+                return cached[0]
+
+        content = self.prompt_builder.build(page_text)
+
+        async def call():
+            async with self.llm_slots:
+                await self.request_bucket.acquire()
+                await self.token_bucket.acquire(estimate_tokens(content))
+                with metrics.timer("stage_seconds", stage="llm"):
+                    return await self.client.chat(
+                        model=self.model,
+                        messages=[ChatMessage(role="user", content=content)],
+                    )
+
+        chat_response = await with_retries(call)
+        usage_info = chat_response.usage
+        usage = None
+        if usage_info:
+            usage = {"prompt_tokens": usage_info.prompt_tokens, "completion_tokens": usage_info.completion_tokens,
+                     "total_tokens": usage_info.total_tokens}
+            for name, value in usage.items():
+                self.usage[name] += value
+        record_llm_usage(usage)
+        extracted_text = chat_response.choices[0].message.content
+        if self.llm_cache is not None:
+            await loop.run_in_executor(None, self.llm_cache.set, page_text, self.prompt_builder.cache_key, self.model,
+                                       extracted_text, usage)
+        return extracted_text
+
+    async def extract_document(self, pdf_path, output_folder=None, pack=True, max_chunk_tokens=None,
+                               **pipeline_options):
+        """
+        OCRs a PDF page by page in executor threads and sends pages to the LLM
+        as soon as they are recognised, packed into context-sized chunks as in
+        ml_bkc.extract_document.
+        Args:
+            pdf_path (str): Path to the PDF file.
+            output_folder (str): If set, page_N.txt and mistral_response_N.json are written there.
+            pack (bool): Share one call between consecutive pages that fit together.
+            max_chunk_tokens (int): Cap on the context used per call.
+            pipeline_options: Passed to ml_bkc.iter_page_texts (dpi, doc_type, spill).
+        Returns:
+            list: One {"pages": [page numbers], "answer": raw LLM answer} per call, in page order.
+        """
+        loop = asyncio.get_running_loop()
+        # The generator runs in executor threads; it only builds the OCR pool if a page is not in the OCR store
+        pages = iter_page_texts(pdf_path, ocr_pool=self.ocr_pool, **pipeline_options)
+        packer = PagePacker(self.prompt_builder.context_budget(self.model, max_tokens=max_chunk_tokens) if pack else 0)
+        chunks = []
+        tasks = []
+        try:
+            while True:
+                item = await loop.run_in_executor(None, next, pages, None)
+                chunk = packer.flush() if item is None else packer.add(*item)
+                if chunk:
+                    chunks.append([page_no for page_no, _ in chunk])
+                    tasks.append(asyncio.create_task(self.chat_page(chunk_text(chunk))))
+                if item is None:
+                    break
+                page_no, page_text = item
+                if output_folder:
+                    _write(os.path.join(output_folder, f"page_{page_no}.txt"), page_text.strip())
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            try:
+                await loop.run_in_executor(None, pages.close)
+            except ValueError:
+                pass  # a cancelled next() is still running; its threads stop on their own
+
+        if output_folder:
+            for page_numbers, extracted_text in zip(chunks, results):
+                _write(os.path.join(output_folder, chunk_filename(page_numbers)), extracted_text)
+        return [{"pages": page_numbers, "answer": answer} for page_numbers, answer in zip(chunks, results)]
+
+    async def extract_documents(self, pdf_paths, max_documents=8, **pipeline_options):
+        """
+        Extracts several PDFs concurrently, at most max_documents at a time.
+        Returns results in input order; a failed document yields its exception.
+        """
+        documents = asyncio.Semaphore(max_documents)
+
+        async def one(pdf_path):
+            async with documents:
+                return await self.extract_document(pdf_path, **pipeline_options)
+
+        return await asyncio.gather(*(one(path) for path in pdf_paths), return_exceptions=True)
+
+    async def fetch_port_code(self, port_of_discharge, country_code):
+        """
+        Async counterpart of PostProcess.fetch_port_code, in the same order:
+        port cache, local UN/LOCODE resolver, then the remote service unless
+        PORT_OFFLINE. Returns "" on failure.
+        """
+        if self.port_cache is not None:
+            port_code = self.port_cache.get(port_of_discharge, country_code)
+            if port_code is not None:
+                metrics.inc("port_lookups_total", source="cache")
+                return port_code
+        if self.port_resolver is not None:
+            locode, score = self.port_resolver.resolve(port_of_discharge, country_code)
+            if locode and score >= self.port_resolver.min_score:
+                metrics.inc("port_lookups_total", source="local")
+                if self.port_cache is not None:
+                    self.port_cache.set(port_of_discharge, country_code, locode)
+                return locode
+            if locode and self.port_offline and score >= self.port_offline_min_score:
+                # A guess: not cached, so an online run still asks the port service
+                metrics.inc("port_lookups_total", source="local_guess")
+                return locode
+        if self.port_offline:
+            metrics.inc("port_lookups_total", source="unresolved")
+            return ""
+
+        async def call():
+            async with self.port_slots:
+                with metrics.timer("port_lookup_seconds"):
+                    response = await self.http.post(
+                        self.port_url, json={"user_description": port_of_discharge, "country_code": country_code})
+                response.raise_for_status()
+                return response.json().get("port_code", "")
+
+        metrics.inc("port_lookups_total", source="remote")
+        try:
+            port_code = await with_retries(call)
+        except (httpx.HTTPError, ValueError) as e:
+            metrics.inc("port_lookup_errors_total", error=type(e).__name__)
+            print(f"Error fetching port code: {e}")
+            return ""
+        if self.port_cache is not None:
+            self.port_cache.set(port_of_discharge, country_code, port_code)
+        return port_code
+
+    async def aclose(self):
+        await self.http.aclose()
+        await self.client.close()
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as output_file:
+        output_file.write(text)
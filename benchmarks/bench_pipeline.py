@@ -0,0 +1,222 @@
+"""
+Throughput and latency benchmark for OCR -> LLM -> post-process, run against
+local stub servers (see stubs.py) with configurable injected latency.
+
+    python benchmarks/bench_pipeline.py --documents 10 --min-pages 5 --max-pages 20 --llm-latency 0.8
+    python benchmarks/bench_pipeline.py --stages post_process --records 50000 --port-latency 0.05
+
+Stages:
+    rasterize     pdf2image, one page at a time
+    ocr           PaddleOCR on the rasterized pages
+    llm           chat_page() against the Mistral stub
+    post_process  PostProcess.post_process / post_process_batch against the port stub
+    end_to_end    extract_text_from_pdf(), stages overlapped by the page pipeline
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stubs import mistral_stub, port_stub  # noqa: E402
+from synthetic import booking_records, write_booking_pdfs  # noqa: E402
+
+ALL_STAGES = ["rasterize", "ocr", "llm", "post_process", "end_to_end"]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except (ImportError, AttributeError):
+            return None
+
+
+class Timer:
+    """Collects per-item durations for one stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.durations = []
+        self.items = 0
+        self.elapsed = 0.0
+
+    def time(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.durations.append(time.perf_counter() - start)
+        return result
+
+    def report(self, unit):
+        row = {"stage": self.name, "unit": unit, "items": self.items, "seconds": round(self.elapsed, 4)}
+        if self.elapsed:
+            row[f"{unit}/sec"] = round(self.items / self.elapsed, 2)
+        if self.durations:
+            ordered = sorted(self.durations)
+            row["p50_ms"] = round(statistics.median(ordered) * 1000, 2)
+            row["p95_ms"] = round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 2)
+            row["max_ms"] = round(ordered[-1] * 1000, 2)
+        return row
+
+
+def bench_rasterize_ocr(pdf_paths, stages, dpi):
+    import ml_bkc
+    rows = []
+    raster, ocr = Timer("rasterize"), Timer("ocr")
+    page_texts = []
+    engine = ml_bkc.OCREngine().warm_up() if "ocr" in stages else None
+    for pdf_path in pdf_paths:
+        pages = ml_bkc.rasterize_pages(pdf_path, dpi=dpi)
+        while True:
+            item = raster.time(next, pages, None)
+            if item is None:
+                raster.durations.pop()
+                break
+            raster.items += 1
+            if engine is not None:
+                result = ocr.time(engine.ocr, ml_bkc._ocr_input(item[1]))
+                ocr.items += 1
+                page_texts.append(ml_bkc.page_text_from_ocr(result[0] if result else []))
+    for timer in (raster, ocr):
+        timer.elapsed = sum(timer.durations)
+    if "rasterize" in stages:
+        rows.append(raster.report("pages"))
+    if "ocr" in stages:
+        rows.append(ocr.report("pages"))
+    return rows, page_texts
+
+
+def bench_llm(page_texts, endpoint, model):
+    import ml_bkc
+    from mistralai.client import MistralClient
+    client = MistralClient(api_key="stub", endpoint=endpoint)
+    llm = Timer("llm")
+    start = time.perf_counter()
+    for page_text in page_texts:
+        llm.time(ml_bkc.chat_page, client, model, page_text)
+        llm.items += 1
+    llm.elapsed = time.perf_counter() - start
+    return [llm.report("pages")]
+
+
+def bench_post_process(records, port_url, batch):
+    import bkc_pp
+    config = dict(bkc_pp.load_config())
+    config.update({"PORT_URL": port_url, "PORT_CACHE_PATH": None})
+    rows = []
+    single = Timer("post_process")
+    post_processor = bkc_pp.PostProcess(config=config)
+    start = time.perf_counter()
+    for record in records:
+        single.time(post_processor.post_process, dict(record))
+        single.items += 1
+    single.elapsed = time.perf_counter() - start
+    rows.append(single.report("records"))
+    rows[-1]["port_cache"] = post_processor.port_cache_stats()
+
+    if batch:
+        batched = Timer("post_process_batch")
+        post_processor = bkc_pp.PostProcess(config=config)
+        start = time.perf_counter()
+        for i in range(0, len(records), batch):
+            chunk = [dict(record) for record in records[i:i + batch]]
+            batched.time(post_processor.post_process_batch, chunk)
+            batched.items += len(chunk)
+        batched.elapsed = time.perf_counter() - start
+        rows.append(batched.report("records"))
+    return rows
+
+
+def bench_end_to_end(pdf_paths, page_counts, endpoint, model, dpi):
+    import ml_bkc
+    os.environ["MISTRAL_ENDPOINT"] = endpoint
+    e2e = Timer("end_to_end")
+    with tempfile.TemporaryDirectory() as output_folder:
+        ml_bkc.get_ocr_pool()
+        start = time.perf_counter()
+        for pdf_path in pdf_paths:
+            result = e2e.time(ml_bkc.extract_text_from_pdf, pdf_path, output_folder, "stub", model, dpi=dpi)
+            if result.startswith("Error"):
+                raise RuntimeError(result)
+            e2e.items += 1
+        e2e.elapsed = time.perf_counter() - start
+    row = e2e.report("documents")
+    if e2e.elapsed:
+        row["pages/sec"] = round(sum(page_counts) / e2e.elapsed, 2)
+    return [row]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="*", default=ALL_STAGES, choices=ALL_STAGES)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--min-pages", type=int, default=5)
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--records", type=int, default=2000, help="records for the post_process stage")
+    parser.add_argument("--batch", type=int, default=500, help="post_process_batch size, 0 to skip")
+    parser.add_argument("--dpi", type=int, default=None)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per Mistral stub response")
+    parser.add_argument("--port-latency", type=float, default=0.05, help="seconds per port stub response")
+    parser.add_argument("--model", default="mistral-large-latest")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON document instead of JSON lines")
+    args = parser.parse_args()
+
+    # Every run must hit the stubs, never a cache from a previous run
+    os.environ["LLM_CACHE_PATH"] = ""
+    # The same seed gives the same PDF bytes, so a stored OCR result would skip the OCR being measured
+    os.environ["OCR_STORE_PATH"] = ""
+    rows = []
+    with mistral_stub(args.llm_latency) as mistral, port_stub(args.port_latency) as ports, \
+            tempfile.TemporaryDirectory() as pdf_folder:
+        pdf_paths = []
+        page_counts = []
+        if set(args.stages) & {"rasterize", "ocr", "llm", "end_to_end"}:
+            pdf_paths = write_booking_pdfs(pdf_folder, args.documents, args.min_pages, args.max_pages, args.seed)
+            from pdf2image import pdfinfo_from_path
+            page_counts = [pdfinfo_from_path(path)["Pages"] for path in pdf_paths]
+
+        page_texts = []
+        if set(args.stages) & {"rasterize", "ocr", "llm"}:
+            stage_rows, page_texts = bench_rasterize_ocr(pdf_paths, args.stages, args.dpi)
+            rows += stage_rows
+        if "llm" in args.stages:
+            if not page_texts:
+                page_texts = [json.dumps(record) for record in booking_records(sum(page_counts), args.seed)]
+            rows += bench_llm(page_texts, mistral.url, args.model)
+        if "post_process" in args.stages:
+            records = booking_records(args.records, args.seed)
+            rows += bench_post_process(records, f"{ports.url}/find-port", args.batch)
+        if "end_to_end" in args.stages:
+            rows += bench_end_to_end(pdf_paths, page_counts, mistral.url, args.model, args.dpi)
+
+        summary = {
+            "documents": len(pdf_paths),
+            "pages": sum(page_counts),
+            "mistral_requests": mistral.requests,
+            "port_requests": ports.requests,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    if args.json:
+        print(json.dumps({"stages": rows, "summary": summary}, indent=2))
+        return
+    for row in rows:
+        print(json.dumps(row))
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import the
+modules and to build a PostProcess, and what the first heavy-dependency use
+costs on top of that.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STEPS = {
+    "import bkc_pp": "import bkc_pp",
+    "import ml_bkc": "import ml_bkc",
+    "PostProcess()": "import bkc_pp; bkc_pp.PostProcess(config={'PORT_CACHE_PATH': None})",
+    "first spaCy use": "import bkc_pp; bkc_pp.PostProcess(config={'PORT_CACHE_PATH': None}).spacy_model",
+    "first OCR engine": "import ml_bkc; ml_bkc.OCREngine().warm_up()",
+}
+
+
+def time_snippet(snippet, runs):
+    # perf_counter inside the child so interpreter startup itself is excluded
+    code = f"import time; t = time.perf_counter(); {snippet}; print(time.perf_counter() - t)"
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per step")
+    parser.add_argument("--steps", nargs="*", default=list(STEPS), choices=list(STEPS))
+    args = parser.parse_args()
+
+    print(f"{'step':<20} {'median s':>10} {'min s':>10} {'max s':>10}")
+    for name in args.steps:
+        timings, error = time_snippet(STEPS[name], args.runs)
+        if timings is None:
+            print(f"{name:<20} failed: {error}")
+            continue
+        print(f"{name:<20} {statistics.median(timings):>10.3f} {min(timings):>10.3f} {max(timings):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Local stand-ins for the external services, so benchmarks never touch the
+live Mistral API or the port-lookup service.
+
+    python benchmarks/stubs.py --mistral-port 8700 --port-port 8701 --latency 0.4
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthetic import booking_record
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        request = self._read_json()
+        time.sleep(self.server.latency)
+        self.server.requests += 1
+        self._reply(self.server.respond(self.path, request))
+
+
+class StubServer:
+    """
+    A threaded HTTP server answering with `respond(path, request_json)` after
+    `latency` seconds. Runs in a daemon thread; use as a context manager.
+    """
+
+    def __init__(self, respond, latency=0.0, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.respond = respond
+        self.httpd.latency = latency
+        self.httpd.requests = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def mistral_chat(path, request):
+    """Mimics POST /v1/chat/completions with a booking JSON answer."""
+    content = request.get("messages", [{}])[-1].get("content", "")
+    seed = int(hashlib.md5(content.encode("utf-8")).hexdigest()[:8], 16)
+    answer = json.dumps(booking_record(seed), indent=2)
+    prompt_tokens = len(content) // 4 + 1
+    completion_tokens = len(answer) // 4 + 1
+    return {
+        "id": f"stub-{seed:x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def port_lookup(path, request):
+    """Mimics POST /find-port: a stable fake LOCODE per (description, country)."""
+    country_code = (request.get("country_code") or "XX").upper()[:2]
+    description = request.get("user_description") or ""
+    suffix = hashlib.md5(description.upper().encode("utf-8")).hexdigest()[:3].upper()
+    return {"port_code": f"{country_code}{suffix}"}
+
+
+def mistral_stub(latency=0.0, port=0):
+    return StubServer(mistral_chat, latency=latency, port=port)
+
+
+def port_stub(latency=0.0, port=0):
+    return StubServer(port_lookup, latency=latency, port=port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mistral-port", type=int, default=8700)
+    parser.add_argument("--port-port", type=int, default=8701)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every Mistral response")
+    parser.add_argument("--port-latency", type=float, default=0.0, help="seconds added to every port lookup")
+    args = parser.parse_args()
+
+    with mistral_stub(args.latency, args.mistral_port) as mistral, port_stub(args.port_latency, args.port_port) as ports:
+        print(f"Mistral stub: {mistral.url}  (MISTRAL_ENDPOINT)")
+        print(f"Port stub:    {ports.url}/find-port  (PORT_URL)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
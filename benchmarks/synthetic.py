@@ -0,0 +1,150 @@
+"""
+Synthetic booking confirmations for benchmarks: JSON records shaped like
+the json_part example in bkc_pp, and matching multi-page text PDFs written
+without any third-party PDF library.
+"""
+import os
+import random
+
+CARRIERS = ["MAERSK", "CMA CGM", "COSCO", "EVERGREEN", "ONE", "HAPAG-LLOYD"]
+VESSELS = ["COSCO YINGKOU", "MAERSK ESSEN", "EVER GIVEN", "ONE APUS", "CMA CGM MARCO POLO"]
+PORTS = [("THE ROAD", "AI"), ("LOS ANGELES, CA, USA", "US"), ("ROTTERDAM", "NL"), ("JEBEL ALI", "AE"),
+         ("NHAVA SHEVA", "IN"), ("PORT KLANG", "MY"), ("SHANGHAI", "CN"), ("FELIXSTOWE", "GB")]
+SIZES = ["20GP", "40GP", "40HC", "40RK", "20RK", "45HC"]
+MODES = ["CY/CY", "CFS/CFS", "CY/CFS", "FCL", "LCL"]
+UNITS = ["Piece(s)", "Pallets", "Cartons", "Packages"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def container_number(rng):
+    """A random ISO 6346 container number with a correct check digit."""
+    owner = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3)) + "U"
+    serial = "".join(rng.choice("0123456789") for _ in range(6))
+    values = {}
+    value = 10
+    for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+        if value % 11 == 0:
+            value += 1
+        values[letter] = value
+        value += 1
+    total = sum((values[c] if c.isalpha() else int(c)) * 2 ** i for i, c in enumerate(owner + serial))
+    return f"{owner}{serial}{total % 11 % 10}"
+
+
+def booking_record(seed=0):
+    """One extracted booking, as the LLM would return it before post-processing."""
+    rng = random.Random(seed)
+    port, country = rng.choice(PORTS)
+    date_formats = [
+        lambda d, m, y: f"{d:02d} {MONTHS[m - 1]} {y}",
+        lambda d, m, y: f"{d:02d}.{m:02d}.{y}",
+        lambda d, m, y: f"{y}-{m}-{d}",
+    ]
+    day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2020, 2025)
+    return {
+        "Shipper Name": f"SHIPPER {rng.randint(1, 500)} PTE. LTD.",
+        "Shipper Address": f"{rng.randint(1, 99)} TUAS AVENUE {rng.randint(1, 20)}, SINGAPORE",
+        "Consignee Name": "",
+        "HBL_No": f"HBL{rng.randint(100000, 999999)}",
+        "Carrier Name": rng.choice(CARRIERS),
+        "Booking Number": f"Booking Number: {rng.randint(100000000, 999999999)}",
+        "Departure Date": rng.choice(date_formats)(day, month, year),
+        "Vessel Name": rng.choice(VESSELS),
+        "Voyage No": f"{rng.randint(100, 999)}{rng.choice('EWNS')}",
+        "Port of Discharge": port,
+        "Country Code": country,
+        "Loading Terminal": "PSA Singapore Terminal",
+        "Gross Weight": round(rng.uniform(1000, 28000), 3),
+        "Gross Weight Unit": "TNE",
+        "Container number": container_number(rng),
+        "Container Size": rng.choice(SIZES),
+        "Container Shipment Mode": rng.choice(MODES),
+        "Container Quantity": rng.randint(1, 5),
+        "Container Quantity Unit": "UNT",
+        "Outer Package": rng.randint(1, 400),
+        "Outer Package Unit": rng.choice(UNITS),
+        "Incoterm": rng.choice(["", "FOB", "CIF", "EXW"]),
+    }
+
+
+def booking_records(count, seed=0):
+    return [booking_record(seed + i) for i in range(count)]
+
+
+def booking_pages(record, page_count, seed=0):
+    """Text lines per page for a booking confirmation spread over page_count pages."""
+    rng = random.Random(seed)
+    first = [
+        "BOOKING CONFIRMATION",
+        f"Carrier: {record['Carrier Name']}",
+        record["Booking Number"],
+        f"HBL NO: {record['HBL_No']}",
+        f"Shipper: {record['Shipper Name']}",
+        record["Shipper Address"],
+        f"Vessel: {record['Vessel Name']}   Voyage: {record['Voyage No']}",
+        f"ETD: {record['Departure Date']}",
+        f"Port of Discharge: {record['Port of Discharge']}",
+        f"Loading Terminal: {record['Loading Terminal']}",
+    ]
+    cargo = [
+        "CARGO DETAILS",
+        f"Container No: {record['Container number']}   Size: {record['Container Size']}",
+        f"Gross Weight: {record['Gross Weight']} KGS",
+        f"No of packages: {record['Outer Package']} {record['Outer Package Unit']}",
+        f"Service: {record['Container Shipment Mode']}",
+    ]
+    filler = [
+        "Terms and conditions of carriage apply to this booking.",
+        "Cut-off times are subject to change by the terminal operator.",
+        "Please quote the booking number on all correspondence.",
+        "Verified gross mass must be submitted before the VGM cut-off.",
+    ]
+    pages = [first + cargo] if page_count == 1 else [first, cargo]
+    while len(pages) < page_count:
+        pages.append([rng.choice(filler) for _ in range(30)])
+    return pages
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Writes a minimal A4 PDF with one Helvetica text line per list item."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for index, lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * index, 5 + 2 * index
+        stream = "BT /F1 11 Tf 14 TL 56 780 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1", "replace")
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        kids.append(f"{page_id} 0 R")
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for number in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as pdf_file:
+        pdf_file.write(out)
+    return path
+
+
+def write_booking_pdfs(folder, count, min_pages=5, max_pages=20, seed=0):
+    """Writes count synthetic bookings to folder and returns their paths."""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        record = booking_record(seed + i)
+        pages = booking_pages(record, rng.randint(min_pages, max_pages), seed + i)
+        paths.append(write_pdf(os.path.join(folder, f"booking_{i:05d}.pdf"), pages))
+    return paths
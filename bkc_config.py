@@ -0,0 +1,13 @@
+import os
+from functools import lru_cache
+import yaml
+
+# Config file used when none is passed in; override with the BKC_CONFIG environment variable
+DEFAULT_CONFIG_PATH = os.getenv("BKC_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "config_bkc.yaml"))
+
+
+@lru_cache(maxsize=None)
+def load_config(config_path=None):
+    """Loads the YAML configuration file once per path."""
+    with open(config_path or DEFAULT_CONFIG_PATH, "r", encoding="utf-8") as yaml_file:
+        return yaml.safe_load(yaml_file)
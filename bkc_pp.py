@@ -1,35 +1,112 @@
 import re
 import json
-import yaml
-import spacy
-from dateutil import parser
+from functools import cached_property
 # from embed_test import get_port_code  # Adjust path if modules are in different folders
 from stdnum.iso6346 import is_valid
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-# Load the configuration file
-with open(r"D:\Python_programs\version\PaddleOCR\config_bkc.yaml", "r", encoding="utf-8") as yaml_file:
-    config = yaml.safe_load(yaml_file)
+from requests.adapters import HTTPAdapter
+from bkc_config import load_config
+from date_normalizer import normalize_date, normalize_dates
+from metrics import metrics
+from port_cache import PortCodeCache
+from port_resolver import get_port_resolver
+from record_transformer import RecordTransformer
+
+FIELDS_COMPULSORY = [
+    "Shipper Name", "Shipper Address", "ConsigneeName", "HBL_No", "Carrier Name", "Booking Number",
+    "Departure Date", "Vessel Name", "Voyage No", "Country Code", "Port Code",
+    "Port of Discharge", "Loading Terminal", "Gross Weight", "Gross Weight Unit", "Container Shipment Mode",
+    "Incoterms", "Container number", "Container Size", "Container Quantity", "Container Quantity Unit",
+    "Outer Package", "Outer Package Unit"
+]
+# Compulsory fields filled in by post_process rather than read from the document
+DERIVED_FIELDS = ["Port Code"]
+# Used while normalizing, not part of the output
+DROPPED_FIELDS = ["Country Code", "Port Code", "Container Size"]
+# Inferred Container Type based on Shipment Mode
+INFERRED_CONTAINER_TYPE = {
+    "CY/CY": "FCL",
+    "CFS/CFS": "LCL",
+    "CY/CFS": "LCL",
+    "CFS/CY": "FCL"
+}
+CONTAINER_SIZE_PATTERN = re.compile(r'(\d+)')
+
 
-# Load key name mappings from config
-key_name_mapping = config['Booking_Confirmation_Key_Name_Mapping']
-uom_name_mapping = config['UOM_MAPPING']
 class PostProcess:
 
-    def __init__(self):
-        # Initialize the spaCy model
-        self.spacy_model = spacy.load('en_core_web_sm')
-         
+    def __init__(self, config=None, config_path=None):
+        """
+        Args:
+            config (dict): Parsed configuration; takes precedence over config_path.
+            config_path (str): YAML file to load, defaults to DEFAULT_CONFIG_PATH.
+        """
+        self.config = config if config is not None else load_config(config_path)
+        config = self.config
+        self.key_name_mapping = config.get('Booking_Confirmation_Key_Name_Mapping', {})
+
         # Reverse UOM Mapping Initialization
         self.reverse_uom_map = {}
         self.create_reverse_uom_map()
         self.fastapi_url = config.get('FASTAPI_URL', 'http://164.52.218.217:6090/generate')
         self.port_url =config.get('PORT_URL','http://216.48.186.19:8085/find-port')
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        # Bounds the number of concurrent port lookups in post_process_batch
+        self.executor = ThreadPoolExecutor(max_workers=config.get('PORT_LOOKUP_WORKERS', 5))
+
+        # Keep-alive session for the port service; (connect, read) timeouts in seconds
+        self.port_timeout = tuple(config.get('PORT_TIMEOUT', (3.05, 10)))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.get('PORT_POOL_SIZE', 10))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.port_cache = PortCodeCache(
+            db_path=config.get('PORT_CACHE_PATH', 'port_cache.sqlite3'),
+            ttl=config.get('PORT_CACHE_TTL', 7 * 24 * 3600),
+            max_memory_items=config.get('PORT_CACHE_MEMORY_ITEMS', 10000),
+            max_disk_items=config.get('PORT_CACHE_DISK_ITEMS', 500000),
+        )
+        # Local UN/LOCODE index; the remote service is only asked about low-confidence matches
+        self.port_resolver = None
+        if config.get('UNLOCODE_CSV'):
+            self.port_resolver = get_port_resolver(config['UNLOCODE_CSV'], config.get('PORT_MATCH_MIN_SCORE', 0.85))
+        self.port_offline = config.get('PORT_OFFLINE', False)
+        # Lowest score accepted as a best guess when PORT_OFFLINE rules out asking PORT_URL
+        self.port_offline_min_score = config.get('PORT_OFFLINE_MIN_SCORE', 0.6)
+        # Field plan compiled once per key mapping; see record_transformer
+        self.transformer = self.build_transformer(self.key_name_mapping)
+        self._transformers = {}
+
+    def build_transformer(self, key_name_mapping):
+        normalizers = {
+            "Departure Date": self.standardize_date_format,
+            "Gross Weight": self.convert_gross_weight,
+            "Container Size": self.extract_container_size,
+            "Booking Number": self.extract_Booking_Number,
+            "Container number": self.validate_container_number,
+            "Outer Package Unit": self.standardize_uom,
+            "Container Shipment Mode": self.infer_container_type,
+        }
+        return RecordTransformer(key_name_mapping, normalizers, FIELDS_COMPULSORY, DROPPED_FIELDS)
+
+    def get_transformer(self, key_name_mapping):
+        if key_name_mapping is self.key_name_mapping:
+            return self.transformer
+        key = tuple(key_name_mapping.items())
+        transformer = self._transformers.get(key)
+        if transformer is None:
+            transformer = self._transformers[key] = self.build_transformer(key_name_mapping)
+        return transformer
+
+    @cached_property
+    def spacy_model(self):
+        # spaCy takes seconds to import and load, so only do it on first use
+        import spacy
+        return spacy.load('en_core_web_sm')
 
     def create_reverse_uom_map(self):
         self.reverse_uom_map = {}
-        uom_name_mapping = config.get('UOM_MAPPING', {})
+        uom_name_mapping = self.config.get('UOM_MAPPING', {})
 
         for code, names in uom_name_mapping.items():
             for name in names:
@@ -46,34 +123,17 @@ class PostProcess:
         return text.strip()
 
     def standardize_date_format(self, date_str):
-        try:
-            # Attempt to parse the date string with dateutil.parser
-            parsed_date = parser.parse(date_str, dayfirst=True, yearfirst=False)
-            return parsed_date.strftime("%d/%m/%Y")
-        except (ValueError, TypeError):
-            # Handle specific formats manually if needed
-            if re.match(r'\d{2}\.\d{2}\.\d{4}', date_str):
-                # Handle date format like '11.08.2021'
-                return '/'.join(reversed(date_str.split('.')))
-            elif re.match(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}', date_str):
-                # Handle date formats like '2023-7-12' or '2023/7/12'
-                return parser.parse(date_str).strftime("%d/%m/%Y")
-            else:
-                print(f"Warning: Unable to parse the date '{date_str}'.")
-                return ""
+        # Precompiled fast path for the formats we see, memoized, dateutil for the rest
+        return normalize_date(date_str)
 
-    def check_items(self, items):
-        fields_compulsory = [
-            "Shipper Name", "Shipper Address", "ConsigneeName", "HBL_No", "Carrier Name", "Booking Number",
-            "Departure Date", "Vessel Name", "Voyage No", "Country Code", "Port Code",
-            "Port of Discharge", "Loading Terminal", "Gross Weight", "Gross Weight Unit", "Container Shipment Mode",
-            "Incoterms", "Container number", "Container Size", "Container Quantity", "Container Quantity Unit",
-            "Outer Package", "Outer Package Unit"
-        ]
+    def standardize_date_formats(self, date_strs):
+        """Batch form of standardize_date_format for a whole column of dates."""
+        return normalize_dates(date_strs)
 
+    def check_items(self, items):
         available_keys_lower = {key.lower() for key in items.keys()}
 
-        for key in fields_compulsory:
+        for key in FIELDS_COMPULSORY:
             if key.lower() not in available_keys_lower:
                 items[key] = ""
 
@@ -88,6 +148,10 @@ class PostProcess:
 
     def validate_container_number(self, container_number: str) -> str:
         """Validates the container number according to the specified architecture."""
+        if isinstance(container_number, list):
+            # Merged multi-page bookings carry every container found
+            valid = [self.validate_container_number(number) for number in container_number]
+            return [number for number in valid if number]
         if not container_number:
             return ""
 
@@ -103,9 +167,22 @@ class PostProcess:
 
     def extract_container_size(self, container_size):
         # Extract numeric part of the container size
-        match = re.match(r'(\d+)', container_size)
+        if not isinstance(container_size, str):
+            container_size = str(container_size) if container_size is not None else ""
+        match = CONTAINER_SIZE_PATTERN.match(container_size)
         return match.group(1) if match else ""
 
+    def convert_gross_weight(self, gross_weight):
+        # Convert Gross Weight to metric tons if it's a number
+        if isinstance(gross_weight, (int, float)):
+            return gross_weight / 1000
+        return gross_weight
+
+    def infer_container_type(self, shipment_mode):
+        if not isinstance(shipment_mode, str):
+            return shipment_mode
+        return INFERRED_CONTAINER_TYPE.get(shipment_mode.upper().strip(), shipment_mode)
+
     def convert_values_to_strings(self, data):
         if isinstance(data, dict):
             for key, value in data.items():
@@ -122,6 +199,8 @@ class PostProcess:
 
     def standardize_uom(self, uom):
         """Standardizes the UOM to its code based on reverse_uom_map."""
+        if not isinstance(uom, str):
+            return uom
         return self.reverse_uom_map.get(uom.lower(), uom)
     
     def fetch_port_code(self, checked_items):
@@ -141,116 +220,131 @@ class PostProcess:
             #     print("The port code is: SGSIN")
             #     return "SGSIN"
             # else:
-                print("API call")
                 country_code = checked_items.get("Country Code", "")
                 port_of_discharge = checked_items.get("Port of Discharge", "")
-                response = requests.post(self.port_url, json={"user_description": port_of_discharge, "country_code": country_code})
-                print("API response",response)
+                port_code = self.port_cache.get(port_of_discharge, country_code)
+                if port_code is not None:
+                    metrics.inc("port_lookups_total", source="cache", help="Port lookups by where they were answered")
+                    return port_code
+                if self.port_resolver is not None:
+                    locode, score = self.port_resolver.resolve(port_of_discharge, country_code)
+                    if locode and score >= self.port_resolver.min_score:
+                        metrics.inc("port_lookups_total", source="local")
+                        self.port_cache.set(port_of_discharge, country_code, locode)
+                        return locode
+                    if locode and self.port_offline and score >= self.port_offline_min_score:
+                        # A guess: not cached, so an online run still asks PORT_URL
+                        metrics.inc("port_lookups_total", source="local_guess")
+                        return locode
+                if self.port_offline:
+                    metrics.inc("port_lookups_total", source="unresolved")
+                    return ""
+                metrics.inc("port_lookups_total", source="remote")
+                with metrics.timer("port_lookup_seconds", help="Latency of PORT_URL calls"):
+                    response = self.session.post(self.port_url, json={"user_description": port_of_discharge, "country_code": country_code},
+                                                 timeout=self.port_timeout)
                 response.raise_for_status()
-                return response.json().get("port_code", "")
+                port_code = response.json().get("port_code", "")
+                self.port_cache.set(port_of_discharge, country_code, port_code)
+                return port_code
         except requests.RequestException as e:
+            metrics.inc("port_lookup_errors_total", error=type(e).__name__, help="Failed PORT_URL calls")
             print(f"Error fetching HS code: {e}")
             return "" 
-    def post_process(self, input_data, key_name_mapping):
-        # Ensure all required fields exist
-        input_data = self.check_items(input_data)
-
-        # Standardize departure date format
-        input_data['Departure Date'] = self.standardize_date_format(input_data['Departure Date'])
-        input_data["Port of Discharge"] = self.fetch_port_code(input_data) 
-        # Get Port Code using embedding function
-        country_code = input_data.get("Country Code", "")
-        # location_name = input_data.get("Port of Discharge", "")
-        port_code = ""
-        # if country_code and location_name:
-        #     port_code = get_port_code(country_code, location_name)
-        #     input_data["Port Code"] = port_code
-        # else:
-        #     input_data["Port Code"] = ""
-
-        # Update 'Port of Discharge' to "CountryCode + PortCode"
-        if country_code and port_code:
-            input_data["Port of Discharge"] = f"{country_code.upper()}{port_code.upper()}"
-
-        # Convert Gross Weight to metric tons if it's a number
-        if "Gross Weight" in input_data and isinstance(input_data["Gross Weight"], (int, float)):
-            input_data["Gross Weight"] = input_data["Gross Weight"] / 1000
-
-        # Extract numeric part of container size
-        if "Container Size" in input_data:
-            input_data["Container Size"] = self.extract_container_size(input_data["Container Size"])
-
-        # Clean OBL number to remove prefixes like "UCR NO:"
-        # Extract clean OBL number
-        if "Booking Number" in input_data:
-            input_data["Booking Number"] = self.extract_Booking_Number(input_data["Booking Number"])
-
-        if "Container number" in input_data:
-            input_data["Container number"] = self.validate_container_number(input_data.get("Container number", ""))
-
-        # Standardize Outer Package Unit (UOM)
-        if "Outer Package Unit" in input_data:
-            input_data["Outer Package Unit"] = self.standardize_uom(input_data["Outer Package Unit"])
-
-        # Inferred Container Type based on Shipment Mode
-        shipment_mode = input_data.get("Container Shipment Mode", "").upper().strip()
-        inferred_map = {
-            "CY/CY": "FCL",
-            "CFS/CFS": "LCL",
-            "CY/CFS": "LCL",
-            "CFS/CY": "FCL"
-        }
-        inferred_container_type = inferred_map.get(shipment_mode, "")
-        if inferred_container_type:
-            input_data['Container Shipment Mode'] = inferred_container_type
-
-        # ContainerSizeType logic
-        container_size = input_data.get("Container Size", "")
-        if input_data['Container Shipment Mode'] and container_size:
-            input_data["ContainerSizeType"] = f"{input_data['Container Shipment Mode'].upper()}{container_size.upper()}"
-
-        fields_compulsory = ["Country Code", "Port Code", "Container Size"]
-
-        for item in fields_compulsory:
-            input_data.pop(item, None)  # Safely remove item if it exists
-
-        final_output = self.change_keys(input_data, key_name_mapping)
-
-        # Convert all numeric values to strings for uniformity
-        self.convert_values_to_strings(final_output)
 
+    def port_cache_stats(self):
+        """Hit/miss counters of the port-code cache."""
+        return self.port_cache.stats()
+
+    def post_process(self, input_data, key_name_mapping=None):
+        key_name_mapping = key_name_mapping or self.key_name_mapping
+        port_of_discharge = self.fetch_port_code(input_data)
+        return self.normalize_record(input_data, key_name_mapping, port_of_discharge)
+
+    def post_process_batch(self, records, key_name_mapping=None):
+        """
+        Post-processes many records at once. Each distinct (Port of Discharge,
+        Country Code) pair is looked up only once, concurrently on self.executor,
+        before the CPU-only normalizations run over the records.
+        Args:
+            records (list): Extracted booking dicts.
+            key_name_mapping (dict): Output key renames, defaults to the config mapping.
+        Returns:
+            list: Results in input order. A record that fails is returned as
+            {"error": message} without affecting the others.
+        """
+        key_name_mapping = key_name_mapping or self.key_name_mapping
+        lookups = {}
+        for record in records:
+            if isinstance(record, dict):
+                port_of_discharge = record.get("Port of Discharge", "")
+                country_code = record.get("Country Code", "")
+                key = PortCodeCache.make_key(port_of_discharge, country_code)
+                if key not in lookups:
+                    lookups[key] = {"Port of Discharge": port_of_discharge, "Country Code": country_code}
+
+        futures = {self.executor.submit(self.fetch_port_code, items): key for key, items in lookups.items()}
+        port_codes = {}
+        for future in as_completed(futures):
+            try:
+                port_codes[futures[future]] = future.result()
+            except Exception as e:
+                print(f"Error fetching port code: {e}")
+                port_codes[futures[future]] = ""
+
+        results = []
+        for record in records:
+            try:
+                key = PortCodeCache.make_key(record.get("Port of Discharge", ""), record.get("Country Code", ""))
+                results.append(self.normalize_record(record, key_name_mapping, port_codes[key]))
+            except Exception as e:
+                metrics.inc("record_errors_total", help="Records that failed post-processing")
+                results.append({"error": f"Error post-processing record: {e}"})
+        return results
+
+    def normalize_record(self, input_data, key_name_mapping, port_of_discharge):
+        """
+        CPU-only part of post_process, applied once the port code is known.
+        Missing compulsory fields are filled, values normalized, keys renamed
+        and numbers stringified in a single pass; input_data is left unchanged.
+        """
+        transformer = self.get_transformer(key_name_mapping)
+        with metrics.timer("stage_seconds", stage="post_process"):
+            final_output = transformer.transform(input_data, port_of_discharge)
+        metrics.inc("records_total", help="Records post-processed")
         return final_output
 
 
-# Example JSON data
-json_part = {
-  "Shipper Name": "",
-  "Shipper Address": "",
-  "Consignee Name": "",
-  "HBL_No": "",
-  "Carrier Name": "MAERSK",
-  "Booking Number": "212437194",
-  "Departure Date": "14 Aug 2021",
-  "Vessel Name": "COSCO YINGKOU",
-  "Voyage No": "131W",
-  "Port of Discharge": "THE ROAD",
-  "Country Code": "AI",
-  "Loading Terminal": "PSA Singapore Terminal",
-  "Gross Weight": 18000.000,
-  "Gross Weight Unit": "TNE",
-  "Container number": "",
-  "Container Size": "40 DRY",
-  "Container Shipment Mode":  "FCL",
-  "Container Quantity": 1,
-  "Container Quantity Unit": "UNT",
-  "Outer Package": 1,
-  "Outer Package Unit": "Piece(s)",
-  "Incoterm": ""
-}
-
-# Run post-processing
-post_processor = PostProcess()
-final_data = post_processor.post_process(json_part, key_name_mapping)
-
-# Print the formatted output JSON
-print(json.dumps(final_data, indent=4))
+if __name__ == "__main__":
+    # Example JSON data
+    json_part = {
+      "Shipper Name": "",
+      "Shipper Address": "",
+      "Consignee Name": "",
+      "HBL_No": "",
+      "Carrier Name": "MAERSK",
+      "Booking Number": "212437194",
+      "Departure Date": "14 Aug 2021",
+      "Vessel Name": "COSCO YINGKOU",
+      "Voyage No": "131W",
+      "Port of Discharge": "THE ROAD",
+      "Country Code": "AI",
+      "Loading Terminal": "PSA Singapore Terminal",
+      "Gross Weight": 18000.000,
+      "Gross Weight Unit": "TNE",
+      "Container number": "",
+      "Container Size": "40 DRY",
+      "Container Shipment Mode":  "FCL",
+      "Container Quantity": 1,
+      "Container Quantity Unit": "UNT",
+      "Outer Package": 1,
+      "Outer Package Unit": "Piece(s)",
+      "Incoterm": ""
+    }
+
+    # Run post-processing
+    post_processor = PostProcess()
+    final_data = post_processor.post_process(json_part)
+
+    # Print the formatted output JSON
+    print(json.dumps(final_data, indent=4))
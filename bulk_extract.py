@@ -0,0 +1,215 @@
+"""
+Bulk extraction over a directory (or manifest) of booking confirmation PDFs.
+Each PDF is extracted with ml_bkc, the per-call answers are merged into one
+booking record and run through PostProcess, and one JSON line per document
+is appended to the output file.
+
+The output file doubles as the checkpoint: a document whose line is already
+there is skipped, so an interrupted run resumes where it stopped. Documents
+that failed are recorded with "status": "error" and are retried with
+--retry-errors.
+
+    python bulk_extract.py D:\\bookings --output bookings.jsonl --workers 4
+    python bulk_extract.py --manifest todo.txt --output bookings.jsonl --pages-dir pages
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+# Per-process state, built once by _init_worker
+_worker = {}
+
+
+def find_pdfs(directory):
+    pdf_paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                pdf_paths.append(os.path.join(root, name))
+    return sorted(pdf_paths)
+
+
+def read_manifest(manifest_path):
+    """One PDF path per line; blank lines and lines starting with # are ignored."""
+    with open(manifest_path, "r", encoding="utf-8") as manifest:
+        return [line.strip() for line in manifest if line.strip() and not line.startswith("#")]
+
+
+def document_id(pdf_path):
+    return os.path.normcase(os.path.abspath(pdf_path))
+
+
+def pages_folder_name(pdf_path):
+    # Same-named PDFs in different folders must not share a pages folder
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return f"{stem}_{hashlib.sha1(document_id(pdf_path).encode('utf-8')).hexdigest()[:10]}"
+
+
+def repair_checkpoint(output_path):
+    """
+    Makes sure new entries start on a line of their own: a last line left
+    unfinished by an interrupted run is cut off, a complete one gets its newline.
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as output_file:
+        output_file.seek(0, os.SEEK_END)
+        size = output_file.tell()
+        if size == 0:
+            return
+        output_file.seek(-1, os.SEEK_END)
+        if output_file.read(1) == b"\n":
+            return
+        # Find the end of the last complete line
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            output_file.seek(position - step)
+            block = output_file.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+        output_file.seek(position)
+        try:
+            json.loads(output_file.read())
+            # A complete entry that only lacks its newline
+            output_file.write(b"\n")
+            return
+        except ValueError:
+            pass
+        print(f"Dropping {size - position} bytes of an unfinished line at the end of {output_path}")
+        output_file.truncate(position)
+
+
+def load_checkpoint(output_path, retry_errors=False):
+    """Ids of documents already in the output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as output_file:
+        for line in output_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if retry_errors and entry.get("status") != "ok":
+                continue
+            done.add(entry.get("id"))
+    return done
+
+
+def _init_worker(api_key, model, config_path, pages_dir, extract_options):
+    # One OCR engine per worker process: the pool of processes is the parallelism
+    os.environ.setdefault("OCR_POOL_SIZE", "1")
+    import ml_bkc
+    from bkc_pp import PostProcess
+    _worker.update(
+        ml_bkc=ml_bkc,
+        client=ml_bkc.mistral_client(api_key),
+        post_processor=PostProcess(config_path=config_path),
+        api_key=api_key,
+        model=model,
+        pages_dir=pages_dir,
+        extract_options=extract_options,
+    )
+
+
+def _extract_one(pdf_path):
+    ml_bkc = _worker["ml_bkc"]
+    start = time.perf_counter()
+    entry = {"id": document_id(pdf_path), "pdf": pdf_path}
+    try:
+        output_folder = None
+        if _worker["pages_dir"]:
+            # One folder per document so page files never overwrite each other
+            output_folder = os.path.join(_worker["pages_dir"], pages_folder_name(pdf_path))
+            os.makedirs(output_folder, exist_ok=True)
+        chunks = ml_bkc.extract_document(pdf_path, _worker["api_key"], _worker["model"],
+                                         output_folder=output_folder, client=_worker["client"],
+                                         **_worker["extract_options"])
+        chunk_records = [ml_bkc.chunk_record(chunk) for chunk in chunks]
+        record = _worker["post_processor"].post_process(ml_bkc.merge_records(chunk_records))
+        entry.update(status="ok", pages=sum(len(chunk["pages"]) for chunk in chunks), calls=len(chunks),
+                     unparsed_calls=chunk_records.count(None), record=record)
+    except Exception as e:
+        entry.update(status="error", error=f"{type(e).__name__}: {e}")
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def run(pdf_paths, output_path, api_key, model, workers=None, config_path=None, pages_dir=None,
+        retry_errors=False, extract_options=None):
+    """
+    Extracts pdf_paths with a pool of worker processes, appending results to
+    output_path and skipping documents it already contains.
+    Returns:
+        dict: Counts of documents processed, skipped and failed.
+    """
+    repair_checkpoint(output_path)
+    done = load_checkpoint(output_path, retry_errors)
+    pending = [path for path in pdf_paths if document_id(path) not in done]
+    summary = {"total": len(pdf_paths), "skipped": len(pdf_paths) - len(pending), "ok": 0, "error": 0}
+    print(f"{summary['skipped']} of {len(pdf_paths)} documents already done, {len(pending)} to go")
+    if not pending:
+        return summary
+
+    workers = workers or max(1, (os.cpu_count() or 1) // 4)
+    start = time.perf_counter()
+    init_args = (api_key, model, config_path, pages_dir, extract_options or {})
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=init_args) as pool, \
+            open(output_path, "a", encoding="utf-8") as output_file:
+        for count, entry in enumerate(pool.imap_unordered(_extract_one, pending), start=1):
+            output_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            # The line is the checkpoint, so make sure it is on disk before moving on
+            output_file.flush()
+            os.fsync(output_file.fileno())
+            summary[entry["status"]] += 1
+            if entry["status"] != "ok":
+                print(f"Failed {entry['pdf']}: {entry['error']}")
+            if count % 50 == 0 or count == len(pending):
+                rate = count / (time.perf_counter() - start)
+                print(f"{count}/{len(pending)} documents, {rate:.2f} docs/sec")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", nargs="?", help="folder searched recursively for PDFs")
+    parser.add_argument("--manifest", help="text file with one PDF path per line")
+    parser.add_argument("--output", required=True, help="JSONL results file, also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cores // 4)")
+    parser.add_argument("--model", default="mistral-large-latest")
+    parser.add_argument("--env-file", default=None, help=".env file holding MY_KEY")
+    parser.add_argument("--config", default=None, help="config_bkc.yaml path for PostProcess")
+    parser.add_argument("--pages-dir", default=None, help="also write page_N.txt / mistral_response_N.json per document")
+    parser.add_argument("--doc-type", default="Booking_Confirmation")
+    parser.add_argument("--dpi", type=int, default=None)
+    parser.add_argument("--spill", choices=["file", "mmap"], default=None)
+    parser.add_argument("--retry-errors", action="store_true", help="re-run documents recorded as failed")
+    args = parser.parse_args(argv)
+
+    if bool(args.directory) == bool(args.manifest):
+        parser.error("give either a directory or --manifest")
+    pdf_paths = find_pdfs(args.directory) if args.directory else read_manifest(args.manifest)
+
+    load_dotenv(args.env_file)
+    api_key = os.getenv("MY_KEY")
+    if not api_key:
+        parser.error("MY_KEY is not set")
+
+    summary = run(pdf_paths, args.output, api_key, args.model, workers=args.workers, config_path=args.config,
+                  pages_dir=args.pages_dir, retry_errors=args.retry_errors,
+                  extract_options={"doc_type": args.doc_type, "dpi": args.dpi, "spill": args.spill})
+    print(json.dumps(summary))
+    return 0 if summary["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
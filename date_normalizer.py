@@ -0,0 +1,115 @@
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from dateutil import parser
+
+OUTPUT_FORMAT = "{day:02d}/{month:02d}/{year:04d}"
+
+MONTHS = {
+    "JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6,
+    "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12,
+}
+
+# Time of day after the date, e.g. "14 Aug 2021 10:30" or "14-AUG-2021 10:30 PM"
+_TIME_SUFFIX = re.compile(r"[T\s]+\d{1,2}:\d{2}(:\d{2})?(\s*[AP]M)?\s*$", re.IGNORECASE)
+
+# dateutil fills missing parts from its default; parsing against two defaults that
+# differ in every part shows whether the text held a full date
+_PARSE_DEFAULTS = (datetime(1904, 1, 1), datetime(1908, 12, 28))
+
+# Formats we actually receive, tried in order before falling back to dateutil.
+# Numeric dates are day first, matching the dayfirst=True the pipeline always used.
+_FORMATS = [
+    # 14 Aug 2021, 14-AUG-2021, 14 August, 2021, 14.Aug.21
+    ("dmy", re.compile(r"(\d{1,2})(?:st|nd|rd|th)?[\s\-./]*([A-Za-z]{3,9})\.?[\s\-./,]*(\d{4}|\d{2})$")),
+    # Aug 14, 2021, August 14 2021
+    ("mdy", re.compile(r"([A-Za-z]{3,9})\.?[\s\-]*(\d{1,2})(?:st|nd|rd|th)?[\s,\-]*(\d{4})$")),
+    # 2023-7-12, 2023/07/12, 2023.07.12
+    ("ymd", re.compile(r"(\d{4})[\-/.](\d{1,2})[\-/.](\d{1,2})$")),
+    # 11.08.2021, 11/08/2021, 11-8-21
+    ("dmy", re.compile(r"(\d{1,2})[\-/.](\d{1,2})[\-/.](\d{4}|\d{2})$")),
+]
+
+
+def _month(value):
+    if value.isdigit():
+        return int(value)
+    return MONTHS.get(value[:3].upper())
+
+
+def _year(value):
+    year = int(value)
+    return year + 2000 if len(value) == 2 else year
+
+
+def _fast_parse(text):
+    for order, pattern in _FORMATS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        if order == "dmy":
+            day, month, year = match.group(1), match.group(2), match.group(3)
+        elif order == "mdy":
+            month, day, year = match.group(1), match.group(2), match.group(3)
+        else:
+            year, month, day = match.group(1), match.group(2), match.group(3)
+        month = _month(month)
+        if month is None:
+            continue
+        try:
+            parsed = date(_year(year), month, int(day))
+        except ValueError:
+            continue
+        return OUTPUT_FORMAT.format(day=parsed.day, month=parsed.month, year=parsed.year)
+    return None
+
+
+@lru_cache(maxsize=65536)
+def _normalize(text):
+    text = _TIME_SUFFIX.sub("", text.strip())
+    if not text:
+        return ""
+    result = _fast_parse(text)
+    if result is not None:
+        return result
+    try:
+        first, second = (parser.parse(text, dayfirst=True, yearfirst=False, default=default)
+                         for default in _PARSE_DEFAULTS)
+    except (ValueError, OverflowError, TypeError):
+        print(f"Warning: Unable to parse the date '{text}'.")
+        return ""
+    if first.date() != second.date():
+        # "May 2021" or "14 Aug": not a full date, and guessing would depend on today
+        print(f"Warning: Incomplete date '{text}'.")
+        return ""
+    return OUTPUT_FORMAT.format(day=first.day, month=first.month, year=first.year)
+
+
+def normalize_date(value):
+    """
+    Normalizes a date to DD/MM/YYYY. Known formats are matched with
+    precompiled patterns, anything else goes through dateutil (day first).
+    Results are memoized per distinct string. Returns "" when unparseable.
+    """
+    if isinstance(value, (list, tuple)):
+        # The LLM sometimes answers with a list of candidate dates; the first one is the ETD
+        value = next((item for item in value if item), "")
+    if not value:
+        return ""
+    return _normalize(str(value))
+
+
+def normalize_dates(values):
+    """
+    Batch form of normalize_date for a column of dates. Not vectorized: it is
+    a loop that parses each distinct value once and reuses the result.
+    """
+    seen = {}
+    results = []
+    for value in values:
+        key = value if isinstance(value, str) else repr(value)
+        result = seen.get(key)
+        if result is None:
+            result = seen[key] = normalize_date(value)
+        results.append(result)
+    return results
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def normalize_page_text(text):
+    # OCR line breaks and spacing vary run to run without changing the content
+    return " ".join(str(text or "").split())
+
+
+def response_key(page_text, prompt, model):
+    digest = hashlib.sha256()
+    for part in (model, prompt, normalize_page_text(page_text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Content-addressed on-disk cache of LLM answers keyed by
+    sha256(model, prompt template, normalized page text).
+    Entries are evicted least-recently-used once the stored answers exceed max_bytes.
+    Args:
+        db_path (str): SQLite file holding the cache.
+        max_bytes (int): Size budget for cached answers.
+    """
+
+    # Hits only note their access time in memory; the times are written (and
+    # eviction checked) once this many are pending or stores have happened
+    EVICT_EVERY = 200
+
+    def __init__(self, db_path="llm_cache.sqlite3", max_bytes=1024 ** 3):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.accessed = {}
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "tokens_saved": 0}
+        self.db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, content TEXT NOT NULL, usage TEXT, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+
+    def get(self, page_text, prompt, model):
+        """Returns (content, usage dict or None) for a cached answer, or None on a miss."""
+        key = response_key(page_text, prompt, model)
+        with self.lock:
+            row = self.db.execute("SELECT content, usage FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.accessed[key] = time.time()
+            if len(self.accessed) >= self.EVICT_EVERY:
+                self._flush_accessed()
+            self.counters["hits"] += 1
+            usage = json.loads(row[1]) if row[1] else None
+            if usage:
+                self.counters["tokens_saved"] += usage.get("total_tokens", 0)
+            return row[0], usage
+
+    def set(self, page_text, prompt, model, content, usage=None):
+        key = response_key(page_text, prompt, model)
+        usage_json = json.dumps(usage) if usage else None
+        size = len(content.encode("utf-8")) + len(usage_json or "")
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, usage, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, content, usage_json, size, now, now),
+            )
+            self.db.commit()
+            self.counters["stores"] += 1
+            self.writes += 1
+            if self.writes % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def _flush_accessed(self):
+        if not self.accessed:
+            return
+        self.db.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                            [(accessed, key) for key, accessed in self.accessed.items()])
+        self.db.commit()
+        self.accessed.clear()
+
+    def _evict(self):
+        self._flush_accessed()
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until 90% of the budget is left
+        excess = total - int(self.max_bytes * 0.9)
+        freed, doomed = 0, []
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.db.commit()
+        self.counters["evictions"] += len(doomed)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        stats["entries"] = entries
+        stats["bytes"] = size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self.lock:
+            self._flush_accessed()
+            self.db.close()
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Process-wide cache at LLM_CACHE_PATH (default llm_cache.sqlite3).
+    Set LLM_CACHE_PATH to an empty string to disable caching.
+    """
+    global _llm_cache
+    db_path = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+    if not db_path:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache(db_path, max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(1024 ** 3))))
+        return _llm_cache
@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms with labels, exportable as Prometheus
+    text or a JSON snapshot. Sinks added with add_sink(func) are called as
+    func(kind, name, value, labels) for every recorded value, e.g. to forward
+    to StatsD or a log shipper.
+    """
+
+    def __init__(self, prefix="bkc_"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self.sinks = []
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def _emit(self, kind, name, value, labels):
+        for sink in list(self.sinks):
+            try:
+                sink(kind, name, value, labels)
+            except Exception as e:
+                print(f"Metrics sink {sink!r} failed: {e}")
+
+    def inc(self, name, value=1, help="", **labels):
+        name = self.prefix + name
+        key = _label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+            if help:
+                self.help.setdefault(name, help)
+        self._emit("counter", name, value, labels)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, help="", **labels):
+        name = self.prefix + name
+        key = _label_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+            if help:
+                self.help.setdefault(name, help)
+        self._emit("histogram", name, value, labels)
+
+    @contextmanager
+    def timer(self, name, help="", **labels):
+        """Observes the duration of the with-block in seconds, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, help=help, **labels)
+
+    def snapshot(self):
+        """Current values as a JSON-serialisable dict."""
+        with self.lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self.counters.items()
+            }
+            histograms = {
+                name: [
+                    {"labels": dict(key), "count": h.count, "sum": h.sum,
+                     "buckets": dict(zip([str(b) for b in h.buckets], h.counts))}
+                    for key, h in series.items()
+                ]
+                for name, series in self.histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def prometheus_text(self):
+        """Current values in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, count in zip(h.buckets, h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', str(bound))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+# Process-wide registry used by ml_bkc, bkc_pp and async_extract
+metrics = MetricsRegistry()
+
+
+def record_llm_usage(usage, cached=False):
+    """
+    Records one LLM answer: request and token counters plus the tokens-per-page
+    histogram. usage is a dict with prompt_tokens/completion_tokens/total_tokens.
+    Cached answers count their tokens as saved rather than billed.
+    """
+    source = "cache" if cached else "api"
+    metrics.inc("llm_requests_total", source=source, help="LLM answers by source")
+    if not usage:
+        return
+    counter = "llm_tokens_saved_total" if cached else "llm_tokens_total"
+    for kind in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        metrics.inc(counter, usage.get(kind, 0), kind=kind.replace("_tokens", ""), help="LLM tokens")
+    if not cached:
+        metrics.observe("page_tokens", usage.get("total_tokens", 0), buckets=TOKEN_BUCKETS,
+                        help="Billed tokens per LLM call")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = metrics.to_json(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = metrics.prometheus_text(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port=9108, host="0.0.0.0"):
+    """Serves /metrics (Prometheus) and /metrics.json from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
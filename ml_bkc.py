@@ -1,33 +1,45 @@
+import json
 import os
-import paddleocr
-import torch
-from pdf2image import convert_from_path
-from mistralai.client import MistralClient
-from mistralai.models.chat_completion import ChatMessage
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+import numpy as np
+from pdf2image import convert_from_path, pdfinfo_from_path
 from dotenv import load_dotenv
+from llm_cache import get_llm_cache
+from metrics import TOKEN_BUCKETS, metrics, record_llm_usage
+from ocr_store import get_ocr_store, ocr_config_key
+from prompt_builder import estimate_tokens, get_prompt_builder
+from rule_extractor import get_rule_extractor
 
-def extract_text_from_pdf(pdf_path, output_folder, api_key, model):
-    """
-    Extracts text from a PDF using PaddleOCR, returning the combined text
-    with proper newlines and handling potential errors. Saves each page's text
-    as a separate text file in the specified output folder.
-    Args:
-        pdf_path (str): Path to the PDF file.
-        output_folder (str):   to the folder where text files will be saved.
-        api_key (str): Mistral AI API key.
-        model (str): Mistral AI model name.
-    Returns:
-        str: Success message if text extraction is successful, otherwise an error message.
-    """
-    config = {
-            "use_gpu": torch.cuda.is_available(),
+# Threads each PaddleOCR engine uses for CPU inference. The pool size defaults to
+# os.cpu_count() // OCR_CPU_THREADS so engines do not oversubscribe the cores.
+# torch, paddleocr and mistralai are imported on first use to keep imports fast.
+OCR_CPU_THREADS = int(os.getenv("OCR_CPU_THREADS", "4"))
+
+
+@lru_cache(maxsize=1)
+def use_gpu():
+    """Probes CUDA once per process instead of once per document."""
+    import torch
+    return torch.cuda.is_available()
+
+
+def build_ocr_config(cpu_threads=OCR_CPU_THREADS, gpu=None):
+    gpu = use_gpu() if gpu is None else gpu
+    return {
+            "use_gpu": gpu,
             "lang": "en",
             # Detection Module Configuration
             "det": {
                 "architecture": "DBNet++",
                 "pre_trained": True,
                 "model_dir": "./models/dbnet_v3_det/",
-                "use_gpu": torch.cuda.is_available(),
+                "use_gpu": gpu,
                 "backbone": "ResNet50_vd",
             },
             # Recognition Module Configuration
@@ -35,7 +47,7 @@ def extract_text_from_pdf(pdf_path, output_folder, api_key, model):
                 "architecture": "SAR",
                 "character_type": "alphanumeric",
                 "num_classes": 95,
-                "use_gpu": torch.cuda.is_available(),
+                "use_gpu": gpu,
                 "model_dir": "./models/sar_v3_rec/",
                 "transform": {
                     "resize": (64, 256),
@@ -63,127 +75,591 @@ def extract_text_from_pdf(pdf_path, output_folder, api_key, model):
             },
             # System Optimization
             "precision": "mixed",
-            "enable_mkldnn": not torch.cuda.is_available(),
+            "enable_mkldnn": not gpu,
+            "cpu_threads": cpu_threads,
             "batch_size": 16,
             "enable_async": True,
             # Logging and Debugging Options
             "log_interval": 50,
             "save_model": True,
         }
+
+
+def default_pool_size(cpu_threads=OCR_CPU_THREADS):
+    """
+    Number of OCR engines to preload in this process.
+    Set OCR_POOL_SIZE to override. Otherwise one engine is created per
+    OCR_CPU_THREADS cores (a single engine on GPU, which serialises anyway).
+    When running several worker processes, give each one OCR_POOL_SIZE=1 and
+    start os.cpu_count() // OCR_CPU_THREADS workers instead.
+    """
+    if os.getenv("OCR_POOL_SIZE"):
+        return max(1, int(os.environ["OCR_POOL_SIZE"]))
+    if use_gpu():
+        return 1
+    return max(1, (os.cpu_count() or 1) // max(1, cpu_threads))
+
+
+class OCREngine:
+    """A long-lived PaddleOCR instance whose models are loaded once."""
+
+    def __init__(self, config=None):
+        import paddleocr
+        self.config = config or build_ocr_config()
+        self.ocr_model = paddleocr.PaddleOCR(**self.config)
+        self.warm = False
+
+    def warm_up(self):
+        # Run a blank page through det/cls/rec so lazy graph setup and
+        # allocator growth happen before the first real document.
+        if not self.warm:
+            blank = np.full((256, 256, 3), 255, dtype=np.uint8)
+            self.ocr_model.ocr(blank, cls=True)
+            self.warm = True
+        return self
+
+    def ocr(self, source, cls=True):
+        return self.ocr_model.ocr(source, cls=cls)
+
+
+class OCREnginePool:
+    """
+    A fixed set of preloaded OCR engines shared by the threads of one process.
+    Args:
+        size (int): Number of engines, see default_pool_size().
+        config (dict): PaddleOCR keyword arguments, see build_ocr_config().
+        warm_up (bool): Run a warm-up inference on every engine at start.
+    """
+
+    def __init__(self, size=None, config=None, warm_up=True):
+        self.size = size or default_pool_size()
+        self.config = config or build_ocr_config()
+        self.engines = queue.Queue()
+        for _ in range(self.size):
+            engine = OCREngine(self.config)
+            if warm_up:
+                engine.warm_up()
+            self.engines.put(engine)
+
+    def warm_up(self):
+        with self.acquire() as engine:
+            engine.warm_up()
+        return self
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        engine = self.engines.get(timeout=timeout)
+        try:
+            yield engine
+        finally:
+            self.engines.put(engine)
+
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool(size=None, warm_up=True):
+    """Returns the process-wide OCR pool, creating it on first use."""
+    global _ocr_pool
+    if _ocr_pool is None:
+        with _ocr_pool_lock:
+            if _ocr_pool is None:
+                _ocr_pool = OCREnginePool(size=size, warm_up=warm_up)
+    return _ocr_pool
+
+
+# Pages buffered between pipeline stages. Small values keep memory flat while
+# still letting rasterize, OCR and the LLM call work on different pages.
+PIPELINE_QUEUE_SIZE = 2
+
+# Rasterization resolution per document type. Born-digital bookings OCR fine
+# at 200-300 dpi; faint scans need more. Anything not listed uses "default".
+RASTER_DPI = {
+    "default": 300,
+    "Booking_Confirmation": 300,
+    "Scanned_Booking_Confirmation": 400,
+}
+
+# Where rendered pages live until they are OCR'd: None keeps PIL images in
+# memory, "file" lets pdftoppm write PNGs to a temp folder, "mmap" stores a
+# raw BGR array per page and reopens it memory-mapped.
+SPILL_MODES = (None, "file", "mmap")
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(q, item, stop):
+    # Blocking put that gives up once the consumer has gone away.
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def raster_dpi(doc_type=None):
+    return RASTER_DPI.get(doc_type, RASTER_DPI["default"])
+
+
+def rasterize_pages(pdf_path, dpi=None, doc_type=None, spill=None, spill_dir=None, pages=None):
+    """
+    Lazily renders a PDF one page at a time, so only the pages currently
+    queued in the pipeline are ever held in memory.
+    Args:
+        pdf_path (str): Path to the PDF file.
+        dpi (int): Resolution; defaults to RASTER_DPI for doc_type.
+        doc_type (str): Key into RASTER_DPI.
+        spill (str): One of SPILL_MODES.
+        spill_dir (str): Folder for spilled pages, required unless spill is None.
+            The caller owns it and removes it once the pages are consumed.
+        pages (list): Page numbers to render, all pages by default.
+    Yields:
+        tuple: (page_no, page) where page is a PIL image, a PNG path or a
+        memory-mapped BGR array depending on spill.
+    """
+    if spill not in SPILL_MODES:
+        raise ValueError(f"Unknown spill mode {spill!r}, expected one of {SPILL_MODES}")
+    if spill and not spill_dir:
+        raise ValueError("spill_dir is required when spilling pages")
+    dpi = dpi or raster_dpi(doc_type)
+    if pages is None:
+        pages = range(1, pdfinfo_from_path(pdf_path)["Pages"] + 1)
+    for page_no in pages:
+        start = time.perf_counter()
+        if spill == "file":
+            page = convert_from_path(
+                pdf_path, dpi=dpi, first_page=page_no, last_page=page_no,
+                output_folder=spill_dir, fmt="png", paths_only=True,
+                output_file=f"page_{page_no}",
+            )[0]
+        else:
+            page = convert_from_path(pdf_path, dpi=dpi, first_page=page_no, last_page=page_no)[0]
+            if spill == "mmap":
+                mmap_path = os.path.join(spill_dir, f"page_{page_no}.npy")
+                # PIL gives RGB, PaddleOCR expects BGR
+                np.save(mmap_path, np.ascontiguousarray(np.asarray(page.convert("RGB"))[:, :, ::-1]))
+                page.close()
+                page = np.load(mmap_path, mmap_mode="r")
+        metrics.observe("stage_seconds", time.perf_counter() - start, stage="rasterize",
+                        help="Time spent per page or record in each pipeline stage")
+        yield page_no, page
+
+
+def _ocr_input(page):
+    if isinstance(page, (str, np.ndarray)):
+        return page
+    # PIL gives RGB, PaddleOCR expects BGR
+    return np.asarray(page.convert("RGB"))[:, :, ::-1]
+
+
+def _release_page(page, spill_dir):
+    # Drop spilled pages as soon as they are OCR'd so disk use stays flat too;
+    # anything still mapped is swept up by iter_page_texts() at the end.
+    if not spill_dir:
+        return
+    path = page if isinstance(page, str) else getattr(page, "filename", None)
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _rasterize_stage(pdf_path, out_q, stop, dpi, doc_type, spill, spill_dir, pages):
     try:
-        ocr = paddleocr.PaddleOCR(**config)
-        results = ocr.ocr(pdf_path, cls=True)
-        client = MistralClient(api_key=api_key)
-        pages = convert_from_path(pdf_path, dpi=600)
-        for i, page in enumerate(results):
-            page_text = ""
-            for line in page:
-                text = line[1][0]  # Access the text content of the line
-                page_text += f"{text}\n"
-               # print(text)
-
-            # Save page text to a text file
-            page_filename = f"page_{i+1}.txt"
-            output_path = os.path.join(output_folder, page_filename)
-            with open(output_path, "w", encoding="utf-8") as text_file:
-                text_file.write(page_text.strip())
-
-            # Define the user prompt
-            user_prompt = '''
- You are a Booking Confirmation Data Extractor responsible for extracting specific fields as mentioned from the booking confirmation text provided. Extract the required fields and convert them into JSON format. Include all rows, even if fields are missing (set them to empty strings in the JSON). Strictly follow these conditions: return only the JSON output, with no extra text, comments, notes, or instructions.
-  Special Condition: If a booking confirmation is spread across multiple pages, ensure that keywords and associated values found on the first page are considered when processing subsequent pages. For example, if certain keywords are found on the first page but their corresponding values are located on the second page, extract the values as if the context was continuous across pages.
-  
-  1. Shipper Name: Extract the full shipper's name by identifying the company name preceding the shipper's address. Prioritize explicitly mentioned keywords like 'SHIP FROM', 'FROM', 'From/via', 'Shipper' or 'Exporter.' If these keywords are not present, extract the first identifiable company name before the shipper's address. Ensure the name includes valid suffixes such as 'Pte. Ltd.,' 'Singapore Pte. Ltd.,' 'Services Limited,' while excluding any location or address details.
-  2. Shipper Address: Extract the full shipper's address that directly follows the shipper’s name. Ensure only the address details are captured, excluding company names and unrelated sections like 'Delivery Address' or 'Invoice Address.' If no direct keyword is present, extract the address associated with the identified shipper name.
-  3  HBL_No : Identify the number from the keyword "House" or "HBL NO".
-  3  Carrier Name:  Identify and extract the carrier name only from the keyword "Carrier". If the keyword is not found, return an empty string.
-  4  Booking Number: A unique numeric or alphanumeric code assigned by the shipping company to identify the booking.Identify and extract the "Booking Number" number by identifying common terms such as "OBL","Booking Number","Booking_confirmation"
-  5  Departure Date: "Extract the primary Estimated Time of Departure (ETD) date from the document, focusing on the first international departure from Singapore. Look for key phrases such as 'Estimated Departure', 'ETD', 'Departure date', or similar terms. Ensure the extracted date is in the format DD MMM YYYY (day as two digits, month as three letters, and year as four digits). Exclude time (hours and minutes). If multiple ETD dates are found, prioritize the one associated with the first international leg of the journey from Singapore. If no ETD date is found, return an empty string."
-  6  Vessel Name: The name of the vessel on which the cargo is to be transported.
-  7  Voyage Number: A unique identifier for the specific voyage of the vessel.
-  8  Country Code: Country codes are standardized by the International Organization for Standardization (ISO) under the ISO 3166-1 alpha-2 standard. These codes are two-letter identifiers for countries. 
-  For example:
-  CN represents China.
-  US represents the United States.
-  GP represents Guam.
-  9  Port Code: What is the three-letter UN/LOCODE seaport code for "Port Of Discharge:" or "Port Delivery"?. Provide only the code without any explanation. Example: If the data includes "Final Destination: LOS ANGELES, CA, USA", the Port Code is LAX.
-  10 Loading Terminal: The terminal or specific location at the port of loading where the cargo will be loaded onto the vessel.
-  11 Total Gross Weight: Uncover and collect the entire gross weight stated in the shipment through the keyword "Gross Weight."
-  12 Total Gross Weight Unit: Default the unit to "TNE".Strictly ignore any other Units
-  13 Container number: Extract the Container Number from the provided text. A valid container number follows the ISO 6346 standard and consists of:
-    (i)   Owner Prefix Code: The first three capital letters identifying the owner (e.g., "MAEU").
-    (ii)  Equipment Category Identifier: The fourth character (e.g., "U" for freight containers).
-    (iii) Serial Number: A six-digit numeric code (e.g., "123456").
-    (iv)  Check Digit: The final digit, typically boxed or separated, used for validation (e.g., "7").
-  Example:
-  "MAEU1234567" → Owner: MAEU, Category: U, Serial: 123456, Check Digit: 7
-  "CAXU7891234" → Owner: CAX, Category: U, Serial: 789123, Check Digit: 4
-  If the container number is invalid or missing, return an empty string. Validate against the above format, ensuring all components are present and in order.
-  14 Container Size: Extract the Container Size from the document using keywords such as "Size" or "CNTR SIZE." Look for values like "40RK," "20GP," or other similar alphanumeric codes that indicate the size and type of the container(e.g., "GP", "RK", "SD", "HC", "SOC"). Ensure the extracted value strictly matches this format and type. If no container size is found, return an empty string.
-  15 No of packages: Extract the Number of Packages from the booking confirmation. This field typically indicates the total count of packages or containers listed for shipment. Return the value as an integer or float. If no such field is found, return an empty string.
-  Expected JSON output format:
-  {
-    "Shipper Name": "{{"type":"string"}}",
-    "Shipper Address": "{{"type":"string"}}",
-    "HBL_No":"{{"type":"string"}}",
-    "Carrier Name": "{{"type":"string"}}",
-    "Booking Number": "{{"type":"string"}}",
-    "Departure Date": [{{"type": "string", "format": "date"}}],
-    "Vessel Name": "{{"type":"string"}}",
-    "Voyage No": "{{"type":"string"}}",
-    "Country Code": "{{"type":"string"}}",
-    "Port Code":  "{{"type":"string"}}",
-    "Port of Discharge": Country Code+Port code,
-    "Loading Terminal": "{{"type":"string"}}",
-    "Gross Weight": "{{"type":"number"}}",
-    "Gross Weight Unit":"{{"type":"string"}}",
-    "Container number":"{{"type":"string"}}",
-    "Container Size":"{{"type":"string"}}",
-    "Number of Packages":"{{"type":"number"}}"
-  }
-  
-    Never say "continue with the remaining," please produce all the tokens available in the input text.
-    Please ensure that if any of the fields are not present in the text, they are set to empty values in the JSON response.
-    Present only the JSON output, without any additional text, comments, or sequential instructions.
-  
-    ###
-    <<<  
-     Context:
-     {text}
-     Answer: '''
-
-            chat_response = client.chat(
-                model=model,
-                messages=[
-                    ChatMessage(role="user",stream=True, content=user_prompt + "Context:\n" + page_text)
-                ]
-            )
-            extracted_text = chat_response.choices[0].message.content
-            print(extracted_text)
-
-            usage_info = chat_response.usage
-            print("Usage info:", usage_info)
-            if usage_info:
-                prompt_tokens = usage_info.prompt_tokens
-                total_tokens = usage_info.total_tokens
-                completion_tokens = usage_info.completion_tokens
-                print(f"Prompt Tokens: {prompt_tokens}")
-                print(f"Total Tokens: {total_tokens}")
-                print(f"Completion Tokens: {completion_tokens}")
-                
-            output_filename = f"mistral_response_{i+1}.json"
-            output_path = os.path.join(output_folder, output_filename)
-            
-            with open(output_path, "w", encoding="utf-8") as json_file:
-                json_file.write(extracted_text)
-                
-
-            return "Text extraction completed. Text files saved in output folder."
+        for page_no, page in rasterize_pages(pdf_path, dpi, doc_type, spill, spill_dir, pages):
+            if not _put(out_q, (page_no, page), stop):
+                return
+    except Exception as e:
+        _put(out_q, _StageError(e), stop)
+        return
+    _put(out_q, _DONE, stop)
+
+
+def _ocr_stage(in_q, out_q, stop, ocr_pool, spill_dir, ocr_store, document_key):
+    while not stop.is_set():
+        item = in_q.get()
+        if item is _DONE or isinstance(item, _StageError):
+            _put(out_q, item, stop)
+            return
+        page_no, page = item
+        try:
+            with ocr_pool.acquire() as ocr, metrics.timer("stage_seconds", stage="ocr"):
+                result = ocr.ocr(_ocr_input(page), cls=True)
+            page_text = page_text_from_ocr(result[0] if result else [])
+            _release_page(page, spill_dir)
+        except Exception as e:
+            _put(out_q, _StageError(e), stop)
+            return
+        metrics.inc("ocr_pages_total", source="ocr", help="Pages by where their OCR result came from")
+        if ocr_store is not None:
+            try:
+                ocr_store.put(document_key, page_no, result[0] if result else [])
+            except (OSError, ValueError) as e:
+                print(f"Error storing OCR result of page {page_no}: {e}")
+        if not _put(out_q, (page_no, page_text), stop):
+            return
+
+
+def page_text_from_ocr(page):
+    page_text = ""
+    for line in page or []:
+        text = line[1][0]  # Access the text content of the line
+        page_text += f"{text}\n"
+    return page_text
+
+
+def _stored_page_text(ocr_store, document_key, page_no):
+    metrics.inc("ocr_pages_total", source="store")
+    return page_no, ocr_store.page_text(document_key, page_no)
+
+
+def iter_page_texts(pdf_path, ocr_pool=None, dpi=None, doc_type=None, spill=None,
+                    queue_size=PIPELINE_QUEUE_SIZE, ocr_store=None):
+    """
+    Rasterizes and OCRs a PDF in background threads, yielding pages in order
+    as soon as each one is recognised. Pages already in ocr_store (the
+    process-wide OCRStore by default, False for none) are read back instead;
+    a fully stored document is neither rasterized nor OCR'd.
+    Args:
+        pdf_path (str): Path to the PDF file.
+        ocr_pool (OCREnginePool): Pool to borrow OCR engines from.
+        dpi (int): Rasterization resolution, overrides doc_type.
+        doc_type (str): Key into RASTER_DPI.
+        spill (str): One of SPILL_MODES, see rasterize_pages().
+        queue_size (int): Maximum pages buffered between two stages.
+        ocr_store (OCRStore): Store of OCR results; None for get_ocr_store(), False to disable.
+    Yields:
+        tuple: (page_no, page_text), page_no starting at 1.
+    """
+    ocr_store = get_ocr_store() if ocr_store is None else (ocr_store or None)
+    document_key, pages, stored = None, None, []
+    if ocr_store is not None:
+        config = ocr_pool.config if ocr_pool is not None else build_ocr_config(gpu=False)
+        document_key = ocr_store.document_key(pdf_path, ocr_config_key(config, dpi or raster_dpi(doc_type)))
+        page_count = ocr_store.page_count(document_key)
+        if page_count is None:
+            page_count = pdfinfo_from_path(pdf_path)["Pages"]
+            ocr_store.set_page_count(document_key, page_count, os.path.basename(pdf_path))
+        pages = [page_no for page_no in range(1, page_count + 1) if not ocr_store.has_page(document_key, page_no)]
+        # Popped from the end, so lowest page first
+        stored = [page_no for page_no in range(page_count, 0, -1) if page_no not in pages]
+        if not pages:
+            for page_no in reversed(stored):
+                yield _stored_page_text(ocr_store, document_key, page_no)
+            return
+
+    ocr_pool = ocr_pool or get_ocr_pool()
+    spill_dir = tempfile.mkdtemp(prefix="bkc_pages_") if spill else None
+    stop = threading.Event()
+    raster_q = queue.Queue(maxsize=queue_size)
+    text_q = queue.Queue(maxsize=queue_size)
+    workers = [
+        threading.Thread(target=_rasterize_stage,
+                         args=(pdf_path, raster_q, stop, dpi, doc_type, spill, spill_dir, pages), daemon=True),
+        threading.Thread(target=_ocr_stage,
+                         args=(raster_q, text_q, stop, ocr_pool, spill_dir, ocr_store, document_key), daemon=True),
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while True:
+            item = text_q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageError):
+                raise item.error
+            while stored and stored[-1] < item[0]:
+                yield _stored_page_text(ocr_store, document_key, stored.pop())
+            yield item
+        while stored:
+            yield _stored_page_text(ocr_store, document_key, stored.pop())
+    finally:
+        stop.set()
+        # Unblock an OCR stage still waiting on the rasterizer
+        try:
+            raster_q.put_nowait(_DONE)
+        except queue.Full:
+            pass
+        for worker in workers:
+            worker.join(timeout=5)
+        if spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def chat_page(client, model, page_text, llm_cache=None, document_usage=None, prompt_builder=None,
+              omit_fields=None):
+    """
+    Sends one page of OCR text to Mistral and returns the raw answer.
+    The prompt comes from prompt_builder (the Booking_Confirmation template in
+    the config by default), asking not to return omit_fields. Identical pages
+    (same text, prompt and model) are answered from llm_cache. Billed tokens
+    are recorded in metrics and, if given, added to the document_usage dict.
+    """
+    from mistralai.models.chat_completion import ChatMessage
+    prompt_builder = prompt_builder or get_prompt_builder()
+    prompt_key = prompt_builder.prompt_key(omit_fields)
+    if llm_cache is not None:
+        cached = llm_cache.get(page_text, prompt_key, model)
+        if cached is not None:
+            record_llm_usage(cached[1], cached=True)
+            return cached[0]
+
+    with metrics.timer("stage_seconds", stage="llm"):
+        chat_response = client.chat(
+            model=model,
+            messages=[
+                ChatMessage(role="user",stream=True, content=prompt_builder.build(page_text, omit_fields))
+            ]
+        )
+    extracted_text = chat_response.choices[0].message.content
+    print(extracted_text)
+
+    usage_info = chat_response.usage
+    usage = None
+    if usage_info:
+        usage = {"prompt_tokens": usage_info.prompt_tokens, "completion_tokens": usage_info.completion_tokens,
+                 "total_tokens": usage_info.total_tokens}
+        if document_usage is not None:
+            for kind, tokens in usage.items():
+                document_usage[kind] = document_usage.get(kind, 0) + tokens
+    record_llm_usage(usage)
+
+    if llm_cache is not None:
+        llm_cache.set(page_text, prompt_key, model, extracted_text, usage)
+    return extracted_text
+
+
+def mistral_client(api_key):
+    from mistralai.client import MistralClient
+    # MISTRAL_ENDPOINT points the client at a proxy or the benchmark stub
+    return MistralClient(api_key=api_key, endpoint=os.getenv("MISTRAL_ENDPOINT", "https://api.mistral.ai"))
+
+
+def parse_llm_json(extracted_text):
+    """
+    Parses the JSON object out of an LLM answer, tolerating ```json fences and
+    stray text around it. Returns None when no object can be parsed.
+    """
+    text = str(extracted_text or "")
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def chunk_record(chunk):
+    """
+    The JSON record of one extract_document() call: the parsed LLM answer
+    with the rule-extracted fields laid over it. None when neither exists.
+    """
+    record = parse_llm_json(chunk["answer"])
+    if chunk.get("fields"):
+        record = dict(record or {}, **chunk["fields"])
+    return record
+
+
+# Fields whose values are collected from every chunk instead of first-wins
+UNION_FIELDS = ("Container number",)
+
+PAGE_SEPARATOR = "\n--- Page {page_no} ---\n"
+
+
+class PagePacker:
+    """
+    Greedily packs consecutive pages into chunks whose text fits a token
+    budget. Feed pages in order with add(); a page that does not fit closes
+    the current chunk, which add() then returns. A page larger than the
+    budget gets a chunk of its own.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.pages = []
+        self.tokens = 0
+
+    def add(self, page_no, page_text):
+        tokens = estimate_tokens(PAGE_SEPARATOR.format(page_no=page_no) + page_text)
+        full = None
+        if self.pages and self.tokens + tokens > self.budget:
+            full = self.flush()
+        self.pages.append((page_no, page_text))
+        self.tokens += tokens
+        return full
+
+    def flush(self):
+        chunk, self.pages, self.tokens = self.pages, [], 0
+        return chunk or None
+
+
+def chunk_text(chunk):
+    """Context for one LLM call; single pages are sent as-is so cache keys match unpacked runs."""
+    if len(chunk) == 1:
+        return chunk[0][1]
+    return "".join(PAGE_SEPARATOR.format(page_no=page_no) + page_text for page_no, page_text in chunk)
+
+
+def chunk_filename(page_numbers):
+    if len(page_numbers) == 1:
+        return f"mistral_response_{page_numbers[0]}.json"
+    return f"mistral_response_{page_numbers[0]}-{page_numbers[-1]}.json"
+
+
+def _filled(value):
+    if isinstance(value, str):
+        return bool(value.strip())
+    return value not in (None, [], {})
+
+
+def merge_records(records):
+    """
+    Reconciles the JSON records of one document's chunks into a single record.
+    Scalars: the first non-empty value wins, in page order. UNION_FIELDS:
+    values from every chunk are unioned in order of appearance; a single value
+    stays a string, several become a list.
+    """
+    merged = {}
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        for key, value in record.items():
+            if key in UNION_FIELDS:
+                values = merged.setdefault(key, [])
+                for item in value if isinstance(value, list) else [value]:
+                    if _filled(item) and item not in values:
+                        values.append(item)
+            elif key not in merged or (not _filled(merged[key]) and _filled(value)):
+                merged[key] = value
+    for key in UNION_FIELDS:
+        if key in merged:
+            values = merged[key]
+            merged[key] = values[0] if len(values) == 1 else (values or "")
+    return merged
+
+
+def extract_document(pdf_path, api_key, model, output_folder=None, ocr_pool=None,
+                     doc_type="Booking_Confirmation", dpi=None, spill=None, llm_cache=None, client=None,
+                     prompt_builder=None, pack=True, max_chunk_tokens=None, rule_extractor=None):
+    """
+    Runs the page pipeline over one PDF and returns the LLM answers. Arguments
+    are as for extract_text_from_pdf; output_folder is optional here, client
+    lets callers reuse one MistralClient across documents and prompt_builder
+    overrides the default PromptBuilder.
+    With pack, consecutive pages share one call as long as they fit the
+    model's context (capped by max_chunk_tokens or PAGE_PACK_MAX_TOKENS);
+    otherwise every page is its own call.
+    With a rule_extractor (get_rule_extractor() when RULE_EXTRACTION is set),
+    the prompt only asks for the fields it did not find with high confidence.
+    Calls are skipped only if RULE_REQUIRED_FIELDS is narrowed to fields the
+    rules can find (rule_extractor.can_skip) and all of them were found; see
+    RuleExtractor for what that trades away.
+    Returns:
+        list: One {"pages": [page numbers], "answer": raw LLM answer, "fields": rule
+        values} per call, in page order; use chunk_record() to combine them.
+    Raises:
+        Exception: Whatever the rasterize, OCR or LLM stage raised.
+    """
+    try:
+        client = client or mistral_client(api_key)
+        llm_cache = llm_cache or get_llm_cache()
+        prompt_builder = prompt_builder or get_prompt_builder()
+        rule_extractor = rule_extractor or get_rule_extractor()
+        document_usage = {}
+        answers = []
+        findings = {}
+        packer = PagePacker(prompt_builder.context_budget(model, max_tokens=max_chunk_tokens) if pack else 0)
+
+        def send(chunk):
+            page_numbers = [page_no for page_no, _ in chunk]
+            text = chunk_text(chunk)
+            fields = {}
+            if rule_extractor is not None:
+                fields = rule_extractor.confident_values(rule_extractor.merge(findings, rule_extractor.extract(text)))
+            if rule_extractor is not None and rule_extractor.can_skip and not rule_extractor.missing_fields(findings):
+                metrics.inc("llm_calls_skipped_total", help="LLM calls answered by the rule extractor alone")
+                extracted_text = json.dumps(fields, indent=2)
+            else:
+                extracted_text = chat_page(client, model, text, llm_cache, document_usage, prompt_builder,
+                                           omit_fields=sorted(fields))
+            answers.append({"pages": page_numbers, "answer": extracted_text, "fields": fields})
+
+            if output_folder:
+                output_path = os.path.join(output_folder, chunk_filename(page_numbers))
+
+                with open(output_path, "w", encoding="utf-8") as json_file:
+                    json_file.write(extracted_text)
+
+        for page_no, page_text in iter_page_texts(pdf_path, ocr_pool=ocr_pool, dpi=dpi,
+                                                     doc_type=doc_type, spill=spill):
+            if output_folder:
+                # Save page text to a text file
+                page_filename = f"page_{page_no}.txt"
+                output_path = os.path.join(output_folder, page_filename)
+                with open(output_path, "w", encoding="utf-8") as text_file:
+                    text_file.write(page_text.strip())
+
+            metrics.inc("pages_total", help="Pages extracted")
+            chunk = packer.add(page_no, page_text)
+            if chunk:
+                send(chunk)
+        chunk = packer.flush()
+        if chunk:
+            send(chunk)
+    except Exception:
+        metrics.inc("documents_total", status="error")
+        raise
+
+    metrics.inc("documents_total", status="ok", help="Documents extracted")
+    metrics.observe("document_tokens", document_usage.get("total_tokens", 0), buckets=TOKEN_BUCKETS,
+                    help="Billed tokens per document")
+    return answers
+
+
+def extract_text_from_pdf(pdf_path, output_folder, api_key, model, ocr_pool=None,
+                          doc_type="Booking_Confirmation", dpi=None, spill=None, llm_cache=None):
+    """
+    Extracts text from a PDF using PaddleOCR, returning the combined text
+    with proper newlines and handling potential errors. Saves each page's text
+    as a separate text file in the specified output folder.
+    Pages are streamed: while page N is with the LLM, page N+1 is being
+    OCR'd and page N+2 rasterized. Consecutive pages are packed into as few
+    LLM calls as the model's context allows, see extract_document().
+    Args:
+        pdf_path (str): Path to the PDF file.
+        output_folder (str):   to the folder where text files will be saved.
+        api_key (str): Mistral AI API key.
+        model (str): Mistral AI model name.
+        ocr_pool (OCREnginePool): Pool to borrow an OCR engine from; defaults to
+            the process-wide pool returned by get_ocr_pool().
+        doc_type (str): Selects the rasterization DPI from RASTER_DPI.
+        dpi (int): Explicit rasterization DPI, overrides doc_type.
+        spill (str): Keep rendered pages in memory (None), or spill them to
+            "file" or "mmap" so peak RSS stays flat for long PDFs.
+        llm_cache (LLMResponseCache): Cache of LLM answers; defaults to get_llm_cache().
+    Returns:
+        str: Success message if text extraction is successful, otherwise an error message.
+    """
+    try:
+        extract_document(pdf_path, api_key, model, output_folder=output_folder, ocr_pool=ocr_pool,
+                         doc_type=doc_type, dpi=dpi, spill=spill, llm_cache=llm_cache)
+        return "Text extraction completed. Text files saved in output folder."
     except Exception as e:
         error_message = f"Error extracting text from PDF: {e}"
         print(error_message)
         return error_message
-    
+
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import numpy as np
+
+# Bump when the on-disk layout changes so old entries are simply not found
+FORMAT_VERSION = 1
+
+# PaddleOCR settings that change speed but not the recognised text
+RUNTIME_KEYS = {"use_gpu", "enable_mkldnn", "cpu_threads", "batch_size", "enable_async", "log_interval", "save_model",
+                "precision"}
+
+
+def _without_runtime_keys(config):
+    if isinstance(config, dict):
+        return {key: _without_runtime_keys(value) for key, value in config.items() if key not in RUNTIME_KEYS}
+    return config
+
+
+def ocr_config_key(config, dpi):
+    """Digest of the OCR settings that affect results: the PaddleOCR config and the raster DPI."""
+    settings = json.dumps({"config": _without_runtime_keys(config), "dpi": dpi, "version": FORMAT_VERSION},
+                          sort_keys=True, default=str)
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+
+def file_digest(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as pdf_file:
+        for block in iter(lambda: pdf_file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class OCRPage:
+    """
+    OCR result of one page in columns: texts (list of str), boxes (float32
+    array of shape (n, 4, 2), the four corner points) and scores (float32
+    array of shape (n,)). Arrays loaded from the store are memory-mapped.
+    """
+
+    def __init__(self, texts, boxes, scores):
+        self.texts = texts
+        self.boxes = boxes
+        self.scores = scores
+
+    @classmethod
+    def from_paddle(cls, lines):
+        """From PaddleOCR's per-page result: [[box, (text, score)], ...]."""
+        lines = lines or []
+        texts = [str(line[1][0]).replace("\n", " ") for line in lines]
+        boxes = np.asarray([line[0] for line in lines], dtype=np.float32).reshape(len(lines), 4, 2)
+        scores = np.asarray([line[1][1] for line in lines], dtype=np.float32)
+        return cls(texts, boxes, scores)
+
+    def to_paddle(self):
+        """Back to PaddleOCR's shape, for code written against ocr.ocr() output."""
+        return [[self.boxes[i].tolist(), (text, float(self.scores[i]))] for i, text in enumerate(self.texts)]
+
+    def text(self):
+        # Same layout as ml_bkc.page_text_from_ocr
+        return "".join(f"{text}\n" for text in self.texts)
+
+
+class OCRStore:
+    """
+    Content-addressed store of OCR results, so documents OCR'd once are
+    never run through PaddleOCR again. A document is addressed by
+    sha256(PDF bytes) and the OCR settings (see ocr_config_key); each page
+    is kept as <page>.txt (one recognised line per row) and <page>.npy (a
+    float32 (n, 9) array: the eight box coordinates and the score), which is
+    memory-mapped on load.
+    Args:
+        root (str): Folder holding the store.
+    """
+
+    def __init__(self, root="ocr_store"):
+        self.root = root
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0}
+
+    def document_key(self, pdf_path, config_key):
+        return hashlib.sha256(f"{file_digest(pdf_path)}\0{config_key}".encode("utf-8")).hexdigest()
+
+    def _document_dir(self, document_key):
+        return os.path.join(self.root, document_key[:2], document_key)
+
+    def _page_path(self, document_key, page_no, extension):
+        return os.path.join(self._document_dir(document_key), f"{page_no}{extension}")
+
+    def _count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def page_count(self, document_key):
+        """Page count recorded for the document, or None if it was never stored."""
+        try:
+            with open(os.path.join(self._document_dir(document_key), "document.json"), "r", encoding="utf-8") as meta:
+                return json.load(meta)["pages"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set_page_count(self, document_key, pages, source=None):
+        os.makedirs(self._document_dir(document_key), exist_ok=True)
+        self._write(os.path.join(self._document_dir(document_key), "document.json"),
+                    json.dumps({"pages": pages, "source": source}).encode("utf-8"))
+
+    def has_page(self, document_key, page_no):
+        # The .txt file is written last, so its presence marks a complete entry
+        return os.path.exists(self._page_path(document_key, page_no, ".txt"))
+
+    def page_text(self, document_key, page_no):
+        """Page text as ml_bkc.page_text_from_ocr builds it, or None on a miss."""
+        try:
+            with open(self._page_path(document_key, page_no, ".txt"), "r", encoding="utf-8", newline="\n") as text_file:
+                text = text_file.read()
+        except OSError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return text
+
+    def get(self, document_key, page_no):
+        """Returns the OCRPage of a stored page, or None on a miss."""
+        text = self.page_text(document_key, page_no)
+        if text is None:
+            return None
+        texts = text.split("\n")[:-1]
+        path = self._page_path(document_key, page_no, ".npy")
+        try:
+            columns = np.load(path, mmap_mode="r")
+        except ValueError:
+            # Empty pages cannot be memory-mapped
+            columns = np.load(path)
+        return OCRPage(texts, columns[:, :8].reshape(-1, 4, 2), columns[:, 8])
+
+    def put(self, document_key, page_no, page):
+        """Stores an OCRPage (or PaddleOCR's per-page result) for one page."""
+        if not isinstance(page, OCRPage):
+            page = OCRPage.from_paddle(page)
+        os.makedirs(self._document_dir(document_key), exist_ok=True)
+        columns = np.empty((len(page.texts), 9), dtype=np.float32)
+        columns[:, :8] = np.asarray(page.boxes, dtype=np.float32).reshape(-1, 8)
+        columns[:, 8] = page.scores
+        buffer = io.BytesIO()
+        np.save(buffer, columns)
+        self._write(self._page_path(document_key, page_no, ".npy"), buffer.getvalue())
+        self._write(self._page_path(document_key, page_no, ".txt"), page.text().encode("utf-8"))
+        self._count("stores")
+
+    def _write(self, path, data):
+        # Write-then-rename so readers and concurrent writers never see half a file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as out_file:
+            out_file.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+_ocr_store = None
+_ocr_store_lock = threading.Lock()
+
+
+def get_ocr_store():
+    """
+    Process-wide store at OCR_STORE_PATH (default ocr_store).
+    Set OCR_STORE_PATH to an empty string to disable it.
+    """
+    global _ocr_store
+    root = os.getenv("OCR_STORE_PATH", "ocr_store")
+    if not root:
+        return None
+    with _ocr_store_lock:
+        if _ocr_store is None:
+            _ocr_store = OCRStore(root)
+        return _ocr_store
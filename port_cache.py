@@ -0,0 +1,120 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class PortCodeCache:
+    """
+    Two-tier cache for port-code lookups: an in-process LRU in front of an
+    on-disk SQLite store shared by every worker on the machine.
+    Keys are the normalized (port description, country code) pair.
+    Args:
+        db_path (str): SQLite file for the disk tier, None disables it.
+        ttl (float): Seconds before an entry is considered stale, in both tiers.
+        max_memory_items (int): LRU capacity.
+        max_disk_items (int): Rows kept on disk; the oldest are evicted first.
+    """
+
+    # Evicting on every write would scan the table each time; do it in batches.
+    EVICT_EVERY = 500
+
+    def __init__(self, db_path="port_cache.sqlite3", ttl=7 * 24 * 3600,
+                 max_memory_items=10000, max_disk_items=500000):
+        self.ttl = ttl
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS port_codes ("
+                "key TEXT PRIMARY KEY, port_code TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS port_codes_created ON port_codes (created)")
+            self.db.commit()
+
+    @staticmethod
+    def make_key(description, country_code):
+        description = re.sub(r"[^0-9A-Z]+", " ", str(description or "").upper()).strip()
+        return f"{str(country_code or '').strip().upper()}|{description}"
+
+    def get(self, description, country_code):
+        """Returns the cached port code ("" is a valid cached answer) or None on a miss."""
+        key = self.make_key(description, country_code)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                port_code, created = entry
+                if now - created < self.ttl:
+                    self.memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return port_code
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT port_code, created FROM port_codes WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    self._remember(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                    return row[0]
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, description, country_code, port_code):
+        key = self.make_key(description, country_code)
+        now = time.time()
+        with self.lock:
+            self._remember(key, port_code, now)
+            self.counters["stores"] += 1
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO port_codes (key, port_code, created) VALUES (?, ?, ?)",
+                    (key, port_code, now),
+                )
+                self.db.commit()
+                self.writes += 1
+                if self.writes % self.EVICT_EVERY == 0:
+                    self._evict_disk(now)
+
+    def _remember(self, key, port_code, created):
+        self.memory[key] = (port_code, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _evict_disk(self, now):
+        cursor = self.db.execute("DELETE FROM port_codes WHERE created < ?", (now - self.ttl,))
+        evicted = cursor.rowcount
+        cursor = self.db.execute(
+            "DELETE FROM port_codes WHERE key IN ("
+            "SELECT key FROM port_codes ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_items,),
+        )
+        evicted += cursor.rowcount
+        self.db.commit()
+        self.counters["evictions"] += max(evicted, 0)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["memory_items"] = len(self.memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
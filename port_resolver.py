@@ -0,0 +1,133 @@
+import csv
+import re
+import threading
+from array import array
+from collections import defaultdict
+from functools import lru_cache
+
+
+def normalize_port_name(text):
+    return " ".join(re.sub(r"[^0-9A-Z]+", " ", str(text or "").upper()).split())
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _CountryIndex:
+    """Locations of one country plus a trigram -> location-id inverted index."""
+
+    def __init__(self):
+        self.names = []
+        self.locodes = []
+        self.is_port = array("b")
+        self.gram_counts = array("H")
+        self.exact = {}
+        self.postings = defaultdict(lambda: array("I"))
+
+    def add(self, name, locode, is_port):
+        location_id = len(self.names)
+        grams = trigrams(name)
+        self.names.append(name)
+        self.locodes.append(locode)
+        self.is_port.append(1 if is_port else 0)
+        self.gram_counts.append(len(grams))
+        # Prefer the seaport when several locations share a name
+        if name not in self.exact or (is_port and not self.is_port[self.exact[name]]):
+            self.exact[name] = location_id
+        for gram in grams:
+            self.postings[gram].append(location_id)
+
+    def search(self, name):
+        location_id = self.exact.get(name)
+        if location_id is not None:
+            return self.locodes[location_id], 1.0
+
+        grams = trigrams(name)
+        overlaps = defaultdict(int)
+        for gram in grams:
+            for candidate in self.postings.get(gram, ()):
+                overlaps[candidate] += 1
+        best, best_score = None, 0.0
+        for candidate, shared in overlaps.items():
+            # Dice coefficient over trigram sets, nudged towards seaports
+            score = 2.0 * shared / (len(grams) + self.gram_counts[candidate])
+            if self.is_port[candidate]:
+                score = min(1.0, score + 0.02)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return None, 0.0
+        return self.locodes[best], best_score
+
+
+class PortResolver:
+    """
+    Offline (description, country code) -> UN/LOCODE lookup built from the
+    UN/LOCODE code list CSV (CodeListPart1/2/3.csv, no header row):
+    Change, Country, Location, Name, NameWoDiacritics, Subdivision, Status, Function, ...
+    Args:
+        csv_paths (list): One or more UN/LOCODE CSV files.
+        min_score (float): Matches scoring below this are reported as low confidence.
+    """
+
+    def __init__(self, csv_paths, min_score=0.85, encoding="latin-1"):
+        if isinstance(csv_paths, str):
+            csv_paths = [csv_paths]
+        self.min_score = min_score
+        self.countries = {}
+        self.size = 0
+        for path in csv_paths:
+            with open(path, "r", encoding=encoding, newline="") as csv_file:
+                for row in csv.reader(csv_file):
+                    self._add_row(row)
+        self.resolve = lru_cache(maxsize=100000)(self._resolve)
+
+    def _add_row(self, row):
+        if len(row) < 8 or not row[2].strip() or len(row[1].strip()) != 2:
+            return
+        if row[0].strip() in ("X", "="):  # entries marked for removal / references
+            return
+        country = row[1].strip().upper()
+        locode = country + row[2].strip().upper()
+        # Function column: position 1 is "1" for seaports
+        is_port = row[7][:1] == "1"
+        index = self.countries.setdefault(country, _CountryIndex())
+        for name in {normalize_port_name(row[3]), normalize_port_name(row[4])}:
+            if name:
+                index.add(name, locode, is_port)
+                self.size += 1
+
+    def _resolve(self, description, country_code):
+        index = self.countries.get(str(country_code or "").strip().upper())
+        name = normalize_port_name(description)
+        if index is None or not name:
+            return None, 0.0
+        best = index.search(name)
+        # "LOS ANGELES, CA, USA" - also try the part before the first comma
+        if best[1] < 1.0 and "," in str(description):
+            head = normalize_port_name(str(description).split(",", 1)[0])
+            if head and head != name:
+                candidate = index.search(head)
+                if candidate[1] > best[1]:
+                    best = candidate
+        return best
+
+    def lookup(self, description, country_code):
+        """Returns the LOCODE when the match is confident, otherwise None."""
+        locode, score = self.resolve(description, country_code)
+        return locode if locode and score >= self.min_score else None
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_port_resolver(csv_paths, min_score=0.85):
+    """Loads each UN/LOCODE list once per process."""
+    key = (tuple([csv_paths] if isinstance(csv_paths, str) else csv_paths), min_score)
+    with _resolvers_lock:
+        if key not in _resolvers:
+            _resolvers[key] = PortResolver(list(key[0]), min_score=min_score)
+        return _resolvers[key]
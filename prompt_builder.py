@@ -0,0 +1,205 @@
+import hashlib
+import re
+import threading
+from bkc_config import load_config
+from metrics import TOKEN_BUCKETS, metrics
+
+# Labels the Booking_Confirmation prompt asks about. Lines around them are kept
+# when keyword windows are enabled; extend with Booking_Confirmation_Keywords in the config.
+DEFAULT_KEYWORDS = [
+    "Shipper", "Ship From", "From/via", "Exporter",
+    "HBL", "House", "Carrier",
+    "Booking", "OBL",
+    "ETD", "Estimated Departure", "Departure",
+    "Vessel", "Voyage",
+    "Country",
+    "Port of Discharge", "Port Delivery", "Place of Delivery", "Final Destination", "POD",
+    "Terminal", "Port of Loading", "POL",
+    "Gross Weight", "Weight",
+    "Container", "CNTR", "Size", "Equipment",
+    "Packages", "No of packages", "Pkgs",
+]
+
+
+# The "--- Page N ---" lines ml_bkc.PAGE_SEPARATOR puts between packed pages
+PAGE_SEPARATOR_PATTERN = re.compile(r"^--- Page \d+ ---$")
+
+
+# Context windows of the Mistral models we call, in tokens
+MODEL_CONTEXT_TOKENS = {
+    "mistral-large-latest": 128000,
+    "mistral-medium-latest": 32000,
+    "mistral-small-latest": 32000,
+    "open-mistral-nemo": 128000,
+    "open-mixtral-8x22b": 64000,
+    "open-mixtral-8x7b": 32000,
+    "open-mistral-7b": 32000,
+}
+DEFAULT_CONTEXT_TOKENS = 32000
+
+# Template lines that belong to one field, so the prompt can be cut down to the
+# fields still missing: numbered instructions ("4  Booking Number: ...", with their
+# continuation lines) up to the expected JSON, and the "Field": lines inside it
+INSTRUCTION_PATTERN = re.compile(r"^\s*\d+\.?\s+([^:]+?)\s*:")
+SCHEMA_START_PATTERN = re.compile(r"^\s*(?:Expected JSON.*|\{)\s*$", re.IGNORECASE)
+SCHEMA_LINE_PATTERN = re.compile(r'^\s*"([^"]+)"\s*:')
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def field_lines(text):
+    """Splits prompt text into (field or None, line) pairs, see INSTRUCTION_PATTERN."""
+    pairs = []
+    field = None
+    in_schema = False
+    for line in text.split("\n"):
+        if in_schema:
+            match = SCHEMA_LINE_PATTERN.match(line)
+            field = match.group(1) if match else None
+            in_schema = line.strip() != "}"
+        elif SCHEMA_START_PATTERN.match(line):
+            field = None
+            in_schema = line.strip() == "{"
+        else:
+            match = INSTRUCTION_PATTERN.match(line)
+            if match:
+                field = match.group(1)
+        pairs.append((field, line))
+    return pairs
+
+
+class PromptBuilder:
+    """
+    Extraction prompt compiled once from a config template containing a
+    {text} placeholder ({{ and }} are literal braces, as in str.format).
+    Args:
+        template (str): Prompt template, e.g. config["Booking_Confirmation"].
+        keywords (list): Labels used by the keyword-window selector.
+        keyword_windows (bool): Trim page text to the lines around keywords.
+        window_lines (tuple): Lines kept (before, after) each keyword line.
+        pack_max_tokens (int): Cap on the context window used when packing pages
+            into one call, below the model's own limit.
+    """
+
+    def __init__(self, template, keywords=None, keyword_windows=False, window_lines=(2, 4), pack_max_tokens=24000):
+        # Drop trailing whitespace and repeated blank lines; they cost tokens, not meaning
+        lines = [line.rstrip() for line in template.strip().splitlines()]
+        compact = re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+        prefix, placeholder, suffix = compact.partition("{text}")
+        if not placeholder:
+            prefix, suffix = compact + "\nContext:\n", ""
+        self.prefix = prefix.replace("{{", "{").replace("}}", "}")
+        self.suffix = suffix.replace("{{", "{").replace("}}", "}")
+        self.field_lines = field_lines(self.prefix)
+        self.prefixes = {}
+        self.keyword_windows = keyword_windows
+        self.window_lines = tuple(window_lines)
+        self.pack_max_tokens = pack_max_tokens
+        keywords = keywords or DEFAULT_KEYWORDS
+        self.keyword_pattern = re.compile(
+            r"\b(?:" + "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)) + r")\b",
+            re.IGNORECASE,
+        )
+        # Identifies this prompt in the LLM response cache
+        settings = (f"{self.keyword_windows}|{self.window_lines}|{self.keyword_pattern.pattern}"
+                    f"|{PAGE_SEPARATOR_PATTERN.pattern}")
+        self.cache_key = hashlib.sha256((self.prefix + "\0" + self.suffix + "\0" + settings).encode("utf-8")).hexdigest()
+        self.prompt_tokens = estimate_tokens(self.prefix + self.suffix)
+
+    @classmethod
+    def from_config(cls, config=None, config_path=None, template_key="Booking_Confirmation"):
+        config = config if config is not None else load_config(config_path)
+        return cls(
+            config[template_key],
+            keywords=DEFAULT_KEYWORDS + list(config.get(f"{template_key}_Keywords") or []),
+            keyword_windows=config.get("PROMPT_KEYWORD_WINDOWS", False),
+            window_lines=config.get("PROMPT_WINDOW_LINES", (2, 4)),
+            pack_max_tokens=config.get("PAGE_PACK_MAX_TOKENS", 24000),
+        )
+
+    def context_budget(self, model, completion_tokens=2048, max_tokens=None):
+        """Tokens of page text that fit in one call next to the instructions and the answer."""
+        window = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+        max_tokens = max_tokens or self.pack_max_tokens
+        if max_tokens:
+            window = min(window, max_tokens)
+        return max(0, window - self.prompt_tokens - completion_tokens)
+
+    def select_windows(self, page_text):
+        """
+        Keeps only the lines within window_lines of a keyword line, joined by
+        "..." where text was cut. Page separators of packed chunks are always
+        kept so each window stays attributed to its page. Returns the text
+        unchanged if no keyword matches.
+        """
+        lines = page_text.splitlines()
+        before, after = self.window_lines
+        keep = []
+        matched = False
+        for i, line in enumerate(lines):
+            if PAGE_SEPARATOR_PATTERN.match(line):
+                start, end = i, i + 1
+            elif self.keyword_pattern.search(line):
+                matched = True
+                start, end = max(0, i - before), min(len(lines), i + after + 1)
+            else:
+                continue
+            if keep and start <= keep[-1][1]:
+                keep[-1][1] = max(keep[-1][1], end)
+            else:
+                keep.append([start, end])
+        if not matched:
+            return page_text
+        return "\n...\n".join("\n".join(lines[start:end]) for start, end in keep)
+
+    def prompt_key(self, omit_fields=None):
+        """LLM cache key of the prompt built with omit_fields left out."""
+        if not omit_fields:
+            return self.cache_key
+        return hashlib.sha256((self.cache_key + "\0" + "\0".join(omit_fields)).encode("utf-8")).hexdigest()
+
+    def prefix_without(self, omit_fields):
+        """The instructions with the lines of omit_fields removed from the field list and the expected JSON."""
+        key = tuple(sorted(omit_fields))
+        prefix = self.prefixes.get(key)
+        if prefix is None:
+            omit = {field.lower() for field in key}
+            lines = [line for field, line in self.field_lines if not (field and field.lower() in omit)]
+            for i, line in enumerate(lines):
+                # The JSON's last remaining field loses its trailing comma
+                if i and line.strip() == "}" and lines[i - 1].endswith(","):
+                    lines[i - 1] = lines[i - 1][:-1]
+            prefix = self.prefixes[key] = "\n".join(lines)
+        return prefix
+
+    def build(self, page_text, omit_fields=None):
+        """
+        Returns the full prompt for one page and logs its token estimate.
+        omit_fields (already known fields) are left out of the instructions,
+        so only the missing fields are asked for.
+        """
+        context = self.select_windows(page_text) if self.keyword_windows else page_text
+        prefix = self.prefix_without(omit_fields) if omit_fields else self.prefix
+        prompt = prefix + context + self.suffix
+        tokens = estimate_tokens(prompt)
+        print(f"Prompt tokens (estimated): {tokens} ({estimate_tokens(prefix + self.suffix)} instructions, "
+              f"{estimate_tokens(context)} context of {estimate_tokens(page_text)})")
+        metrics.observe("prompt_tokens_estimate", tokens, buckets=TOKEN_BUCKETS,
+                        help="Estimated prompt tokens per LLM call")
+        return prompt
+
+
+_prompt_builder = None
+_prompt_builder_lock = threading.Lock()
+
+
+def get_prompt_builder():
+    """Process-wide PromptBuilder compiled from the default config."""
+    global _prompt_builder
+    with _prompt_builder_lock:
+        if _prompt_builder is None:
+            _prompt_builder = PromptBuilder.from_config()
+        return _prompt_builder
@@ -0,0 +1,76 @@
+class RecordTransformer:
+    """
+    Single-pass form of the PostProcess field fixes. The per-field plan
+    (output name, normalizer, whether the field is kept) is built once from
+    the key mapping, and each record is then turned into its output dict in
+    one walk: fill compulsory fields, normalize, rename, drop helper fields
+    and stringify numbers, without intermediate copies. The input record is
+    not modified.
+    Args:
+        key_name_mapping (dict): Output key renames (Booking_Confirmation_Key_Name_Mapping).
+        normalizers (dict): Field name -> callable applied to its value.
+        compulsory_fields (list): Fields added as "" when missing (case-insensitive).
+        dropped_fields (list): Fields used while normalizing but left out of the output.
+        port_field (str): Field that receives the port code passed to transform().
+        size_type_fields (tuple): (shipment mode, container size) fields combined
+            into ContainerSizeType when both are set.
+    """
+
+    def __init__(self, key_name_mapping, normalizers, compulsory_fields, dropped_fields,
+                 port_field="Port of Discharge",
+                 size_type_fields=("Container Shipment Mode", "Container Size")):
+        self.key_name_mapping = dict(key_name_mapping)
+        self.port_field = port_field
+        self.mode_field, self.size_field = size_type_fields
+        dropped = set(dropped_fields)
+        known = set(self.key_name_mapping) | set(normalizers) | set(compulsory_fields) | dropped | {port_field}
+        # field -> (output key, or None to drop it, normalizer or None)
+        self.plan = {
+            field: (None if field in dropped else self.key_name_mapping.get(field, field), normalizers.get(field))
+            for field in known
+        }
+        self.compulsory = [(field, field.lower()) for field in compulsory_fields]
+        self.size_type_key = self.key_name_mapping.get("ContainerSizeType", "ContainerSizeType")
+
+    def _stringify(self, value):
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, dict):
+            return {self.key_name_mapping.get(key, key): self._stringify(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._stringify(item) for item in value]
+        return value
+
+    def transform(self, record, port_of_discharge):
+        output = {}
+        seen = set()
+        fields = {}
+        plan = self.plan
+        for field, value in record.items():
+            seen.add(field.lower())
+            self._apply(output, fields, plan, field, value, port_of_discharge)
+        for field, lowered in self.compulsory:
+            if lowered not in seen:
+                self._apply(output, fields, plan, field, "", port_of_discharge)
+
+        # ContainerSizeType logic
+        shipment_mode = fields.get(self.mode_field)
+        container_size = fields.get(self.size_field)
+        if shipment_mode and container_size:
+            output[self.size_type_key] = f"{str(shipment_mode).upper()}{str(container_size).upper()}"
+        return output
+
+    def _apply(self, output, fields, plan, field, value, port_of_discharge):
+        step = plan.get(field)
+        if step is None:
+            output[field] = self._stringify(value)
+            return
+        output_key, normalizer = step
+        if field == self.port_field:
+            value = port_of_discharge
+        elif normalizer is not None:
+            value = normalizer(value)
+        if field == self.mode_field or field == self.size_field:
+            fields[field] = value
+        if output_key is not None:
+            output[output_key] = self._stringify(value)
@@ -0,0 +1,169 @@
+import re
+import threading
+from stdnum.iso6346 import is_valid
+from bkc_config import load_config
+from date_normalizer import normalize_date
+from metrics import metrics
+
+# Fields the rules can recover from OCR text; the LLM is asked for everything else
+RULE_FIELDS = ("Container number", "Booking Number", "Departure Date", "Container Size")
+# Collected from every match instead of one value per document, as in ml_bkc.UNION_FIELDS
+LIST_FIELDS = ("Container number",)
+
+# Confidence of a value found next to its label, on the line below it, or without a label
+LABELLED, NEXT_LINE, UNLABELLED = 0.95, 0.8, 0.75
+# Confidence when the text holds several different values for a single-valued field
+CONFLICT = 0.5
+
+# ISO 6346: owner code, category U/J/Z, six-digit serial, check digit (OCR may space them out)
+CONTAINER_PATTERN = re.compile(r"\b([A-Z]{3}[UJZ])\s?(\d{6})\s?-?\s?(\d)\b")
+BOOKING_PATTERN = re.compile(
+    r"\b(?:Booking\s*(?:Number|No\.?|Ref(?:erence)?|#)|OBL(?:\s*(?:Number|No\.?))?)"
+    r"([ \t]*[:#.\-]?\s*)([A-Z0-9][A-Z0-9\-/]{4,})",
+    re.IGNORECASE,
+)
+_DATE = (r"\d{1,2}(?:st|nd|rd|th)?[\s\-./]*[A-Za-z]{3,9}\.?[\s\-./,]*\d{2,4}"
+         r"|\d{4}[\-/.]\d{1,2}[\-/.]\d{1,2}"
+         r"|\d{1,2}[\-/.]\d{1,2}[\-/.]\d{2,4}")
+ETD_PATTERN = re.compile(
+    r"\b(?:ETD|Estimated\s+(?:Time\s+of\s+)?Departure(?:\s+Date)?|Departure\s+Date)\b"
+    r"([ \t]*[:.\-]?\s*)(" + _DATE + r")",
+    re.IGNORECASE,
+)
+CONTAINER_SIZE_PATTERN = re.compile(r"\b(20|40|45)\s?'?\s?(GP|DV|DC|HC|HQ|RF|RH|RK|RE|OT|FR|TK|SD|PL)\b",
+                                    re.IGNORECASE)
+SIZE_LABEL_PATTERN = re.compile(r"\b(?:Size|CNTR|Equipment|Container\s+Type|Type)\b", re.IGNORECASE)
+
+
+def _gap_confidence(gap):
+    return NEXT_LINE if "\n" in gap else LABELLED
+
+
+def record_fields():
+    """Fields a post-processed record needs from the document: PostProcess's compulsory fields less derived ones."""
+    # bkc_pp pulls in requests and the port lookup, so only import it when rules are in use
+    from bkc_pp import DERIVED_FIELDS, FIELDS_COMPULSORY
+    return [field for field in FIELDS_COMPULSORY if field not in DERIVED_FIELDS]
+
+
+class RuleExtractor:
+    """
+    Deterministic first pass over page text with precompiled patterns:
+    ISO 6346 container numbers (check digit verified), booking numbers after
+    "Booking Number"/"OBL", ETD dates and container size codes such as 40RK.
+    Each value comes with a confidence; fields at or above min_confidence
+    are left out of the LLM prompt.
+    The LLM call itself can only be skipped when every required field is one
+    of RULE_FIELDS (can_skip). The default, record_fields(), includes fields
+    no rule can find, so by default calls are trimmed but never skipped.
+    Narrowing required_fields to RULE_FIELDS allows skipping, at the cost of
+    the other fields staying empty for documents answered by rules alone.
+    Args:
+        required_fields (list): Fields a document needs, record_fields() by default.
+        min_confidence (float): Confidence at which a rule value is trusted.
+    """
+
+    def __init__(self, required_fields=None, min_confidence=0.9):
+        self.required_fields = list(required_fields) if required_fields else record_fields()
+        self.min_confidence = min_confidence
+        unreachable = [field for field in self.required_fields if field not in RULE_FIELDS]
+        self.can_skip = not unreachable
+        if unreachable:
+            print(f"Rule extraction: {len(unreachable)} required fields ({', '.join(unreachable[:3])}, ...) "
+                  f"have no rule, so LLM calls are trimmed to the missing fields but never skipped. "
+                  f"Set RULE_REQUIRED_FIELDS to a subset of {list(RULE_FIELDS)} to allow skipping.")
+
+    @classmethod
+    def from_config(cls, config=None, config_path=None):
+        config = config if config is not None else load_config(config_path)
+        return cls(
+            required_fields=config.get("RULE_REQUIRED_FIELDS"),
+            min_confidence=config.get("RULE_MIN_CONFIDENCE", 0.9),
+        )
+
+    def extract(self, text):
+        """
+        Returns:
+            dict: field -> {"value": ..., "confidence": float} for the fields found.
+            Container numbers are a list of every valid number in the text.
+        """
+        with metrics.timer("stage_seconds", stage="rules"):
+            found = {}
+            containers = []
+            for match in CONTAINER_PATTERN.finditer(text):
+                number = "".join(match.groups())
+                if number not in containers and is_valid(number):
+                    containers.append(number)
+            if containers:
+                found["Container number"] = {"value": containers, "confidence": 0.99}
+
+            self._add(found, "Booking Number",
+                      [(match.group(2).upper(), _gap_confidence(match.group(1)))
+                       for match in BOOKING_PATTERN.finditer(text) if any(c.isdigit() for c in match.group(2))])
+            self._add(found, "Departure Date",
+                      [(match.group(2).strip(), _gap_confidence(match.group(1)))
+                       for match in ETD_PATTERN.finditer(text) if normalize_date(match.group(2))])
+
+            sizes = []
+            for match in CONTAINER_SIZE_PATTERN.finditer(text):
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                labelled = SIZE_LABEL_PATTERN.search(text, line_start, match.start())
+                sizes.append(((match.group(1) + match.group(2)).upper(), LABELLED if labelled else UNLABELLED))
+            self._add(found, "Container Size", sizes)
+        return found
+
+    def _add(self, found, field, candidates):
+        if not candidates:
+            return
+        values = {value for value, _ in candidates}
+        value = candidates[0][0]
+        confidence = max(c for v, c in candidates if v == value) if len(values) == 1 else CONFLICT
+        found[field] = {"value": value, "confidence": confidence}
+
+    def merge(self, found, new):
+        """Adds the findings of another chunk of the same document to found, in place."""
+        for field, item in new.items():
+            current = found.get(field)
+            if current is None:
+                found[field] = dict(item)
+            elif field in LIST_FIELDS:
+                current["value"] += [value for value in item["value"] if value not in current["value"]]
+                current["confidence"] = max(current["confidence"], item["confidence"])
+            elif current["value"] == item["value"]:
+                if current["confidence"] > CONFLICT:
+                    current["confidence"] = max(current["confidence"], item["confidence"])
+            else:
+                current["confidence"] = CONFLICT
+        return found
+
+    def confident_values(self, found):
+        """Values trusted without the LLM, shaped like an LLM answer."""
+        values = {}
+        for field, item in found.items():
+            if item["confidence"] >= self.min_confidence:
+                value = item["value"]
+                if field in LIST_FIELDS and len(value) == 1:
+                    value = value[0]
+                values[field] = value
+        return values
+
+    def missing_fields(self, found):
+        """Required fields still lacking a value at min_confidence (never empty unless can_skip)."""
+        return [field for field in self.required_fields
+                if field not in found or found[field]["confidence"] < self.min_confidence]
+
+
+_rule_extractor = None
+_rule_extractor_lock = threading.Lock()
+
+
+def get_rule_extractor():
+    """Process-wide RuleExtractor, or None unless RULE_EXTRACTION is enabled in the config."""
+    global _rule_extractor
+    config = load_config()
+    if not config.get("RULE_EXTRACTION", False):
+        return None
+    with _rule_extractor_lock:
+        if _rule_extractor is None:
+            _rule_extractor = RuleExtractor.from_config(config)
+        return _rule_extractor